@@ -0,0 +1,93 @@
+"""Memory of a result set: TexIssue records vs the per-hit dicts used before.
+
+    python benchmarks/bench_issue_memory.py [--hits 200000] [--hits-per-line 4]
+                                            [--files 16] [--file-mb 3]
+
+Two cases are checked:
+
+- dense: one text with the given number of hits, several on every line,
+- sparse: ``--files`` texts of ``--file-mb`` each with a single hit, the common
+  case of a folder with few problems.
+
+For each, tracemalloc measures the memory still held once the results are built,
+and the size of the results pickled as a pool worker sends them back. The legacy
+figure rebuilds the seven-key dicts the checker used to return for the same hits.
+The texts are generated inside the measurement and dropped after the check, so
+they only count as retained where a result keeps them alive.
+"""
+import argparse
+import gc
+import os
+import pickle
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tex_char_checker_app import check_tex_content  # noqa: E402
+
+FILLER_LINE = "本文の文章が続きます $x^2 + y^2 = z^2$ という式を含む行です\n"
+SPARSE_HIT_LINE = "ここで $a，b$ を考える\n"
+
+def make_dense_text(hits, hits_per_line):
+    line = "生成された表の行 " + " & ".join(f"$a_{{{i}}}，b$" for i in range(hits_per_line)) + " \\\\\n"
+    return line * (hits // hits_per_line)
+
+def make_sparse_text(size_bytes):
+    lines = size_bytes // len(FILLER_LINE.encode("utf-8"))
+    return FILLER_LINE * (lines // 2) + SPARSE_HIT_LINE + FILLER_LINE * (lines - lines // 2)
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+def check_all(make_texts):
+    return [check_tex_content(filepath, text, "，", False, "math_only") for filepath, text in make_texts()]
+
+def legacy_dicts(results):
+    return [
+        [
+            {
+                "file": issue.file, "line": issue.line, "col": issue.col,
+                "type": f"Math ({issue.type[6:-1]})", "context": issue.context,
+                "char_pos": issue.char_pos, "detected_char": issue.detected_char,
+            }
+            for issue in result["issues_list"]
+        ]
+        for result in results
+    ]
+
+def report(name, make_texts):
+    results, new_current, new_peak = measure(lambda: check_all(make_texts))
+    hits = sum(len(result["issues_list"]) for result in results)
+    dicts, legacy_current, legacy_peak = measure(lambda: legacy_dicts(results))
+    new_pickled = sum(len(pickle.dumps(result, pickle.HIGHEST_PROTOCOL)) for result in results)
+    legacy_pickled = sum(len(pickle.dumps(issues, pickle.HIGHEST_PROTOCOL)) for issues in dicts)
+    text_bytes = sum(len(text.encode("utf-8")) for _, text in make_texts())
+
+    kb = 1024
+    print(f"{name}: {len(results)} file(s), {text_bytes / kb / kb:.1f} MB of text, {hits} hits")
+    print(f"  {'':10} {'retained':>11} {'peak':>11} {'per hit':>9} {'pickled':>11}")
+    for label, current, peak, pickled in (("dicts", legacy_current, legacy_peak, legacy_pickled),
+                                          ("TexIssue", new_current, new_peak, new_pickled)):
+        print(f"  {label:10} {current / kb:10.1f}K {peak / kb:10.1f}K {current / hits:8.0f}B {pickled / kb:10.1f}K")
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hits", type=int, default=200000)
+    parser.add_argument("--hits-per-line", type=int, default=4)
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--file-mb", type=float, default=3.0)
+    args = parser.parse_args(argv)
+
+    report("dense", lambda: [(os.path.join("generated", "appendix_tables.tex"), make_dense_text(args.hits, args.hits_per_line))])
+    report("sparse", lambda: ((os.path.join("generated", f"chapter_{n:02d}.tex"), make_sparse_text(int(args.file_mb * 1024 * 1024)))
+                              for n in range(args.files)))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
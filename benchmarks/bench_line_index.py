@@ -0,0 +1,93 @@
+"""Micro-benchmark: line/column + context lookup with and without LineIndex.
+
+    python benchmarks/bench_line_index.py [--size-mb 10] [--hits 100000]
+
+Builds a synthetic .tex text of the given size with the given number of target
+hits spread evenly, then resolves every hit with the old per-hit rescans
+(get_line_col_from_pos / get_context_line_from_pos without an index) and with a
+LineIndex. The rescan path grows with hits x file size, so for the larger sizes
+it is timed on a sample of hits and extrapolated (marked with '~').
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tex_char_checker_app import LineIndex, check_tex_content  # noqa: E402
+
+FILLER_LINE = "本文の文章が続きます $x^2 + y^2 = z^2$ という式を含む行です\n"
+HIT_LINE = "ここで $a，b$ を考える\n"
+RESCAN_SAMPLE = 2000
+
+def get_line_col_from_pos(text, pos):
+    if pos > len(text): pos = len(text)
+    line_num = text.count('\n', 0, pos) + 1
+    prev_newline_pos = text.rfind('\n', 0, pos)
+    col_num = pos - prev_newline_pos if prev_newline_pos != -1 else pos + 1
+    return line_num, col_num
+
+def get_context_line_from_pos(text, pos):
+    if pos > len(text): pos = len(text)
+    start_of_line = text.rfind('\n', 0, pos) + 1
+    end_of_line = text.find('\n', pos)
+    if end_of_line == -1: end_of_line = len(text)
+    return text[start_of_line:end_of_line]
+
+def make_text(size_bytes, hits):
+    hit_bytes = len(HIT_LINE.encode("utf-8"))
+    filler_bytes = len(FILLER_LINE.encode("utf-8"))
+    filler_lines = max(0, (size_bytes - hits * hit_bytes) // filler_bytes)
+    per_hit = filler_lines // hits if hits else 0
+    block = FILLER_LINE * per_hit + HIT_LINE
+    return block * hits + FILLER_LINE * (filler_lines - per_hit * hits)
+
+def hit_positions(text):
+    positions = []
+    pos = text.find("，")
+    while pos != -1:
+        positions.append(pos)
+        pos = text.find("，", pos + 1)
+    return positions
+
+def time_rescan(text, positions):
+    sample = positions if len(positions) <= RESCAN_SAMPLE else positions[::len(positions) // RESCAN_SAMPLE]
+    start = time.perf_counter()
+    for pos in sample:
+        get_line_col_from_pos(text, pos)
+        get_context_line_from_pos(text, pos)
+    elapsed = time.perf_counter() - start
+    return elapsed * len(positions) / len(sample), len(sample) < len(positions)
+
+def time_indexed(text, positions):
+    start = time.perf_counter()
+    line_index = LineIndex(text)
+    build = time.perf_counter() - start
+    for pos in positions:
+        line_num, _ = line_index.line_col(pos)
+        line_index.line_text(line_num)
+    return time.perf_counter() - start, build
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=10.0)
+    parser.add_argument("--hits", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    print(f"{'size':>8} {'hits':>8} {'rescan':>11} {'index':>9} {'(build)':>9} {'check_tex_content':>18}")
+    for fraction in (0.125, 0.25, 0.5, 1.0):
+        size = int(args.size_mb * fraction * 1024 * 1024)
+        hits = int(args.hits * fraction)
+        text = make_text(size, hits)
+        positions = hit_positions(text)
+        rescan, extrapolated = time_rescan(text, positions)
+        indexed, build = time_indexed(text, positions)
+        start = time.perf_counter()
+        check_tex_content("synthetic.tex", text, "，", False, "math_only")
+        full = time.perf_counter() - start
+        rescan_text = f"{'~' if extrapolated else ''}{rescan:.2f}s"
+        print(f"{len(text.encode('utf-8')) / 1024 / 1024:7.1f}M {len(positions):8d} {rescan_text:>11} {indexed:8.3f}s {build:8.3f}s {full:17.3f}s")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
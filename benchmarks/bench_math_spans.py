@@ -0,0 +1,91 @@
+"""Micro-benchmark: math span lookups on a paper with dense inline math.
+
+    python benchmarks/bench_math_spans.py [--spans 20000] [--hits 10000]
+
+Builds a synthetic .tex text with the given number of inline ``$...$`` spans,
+a display block every 20 lines, and the given number of text-mode commas, then
+times, for text_only_strict:
+
+- the linear overlap test (every hit against every span), timed on a sample of
+  hits and extrapolated (marked with '~'),
+- classify_hit on the interval index of TexRegions,
+
+and check_tex_content end to end in each search mode.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tex_char_checker_app import SEARCH_MODES, check_tex_content, classify_hit, classify_tex_regions  # noqa: E402
+
+INLINE_LINE = "変数 $x_{%d}$ と $\\alpha + y$ と $z^2$ と $\\frac{a}{b}$ を置く\n"
+HIT_LINE = "ここで，値を決める\n"
+DISPLAY_BLOCK = "\\begin{align}\n a &= b $c$, \\\\ %% 注釈 $d$\n\\end{align}\n"
+INLINE_PER_LINE = 4
+LINEAR_SAMPLE = 200
+
+def make_text(spans, hits):
+    lines = max(1, spans // INLINE_PER_LINE)
+    parts = []
+    hits_left = hits
+    for i in range(lines):
+        parts.append(INLINE_LINE % i)
+        # Spread the hits evenly over the inline lines.
+        due = hits * (i + 1) // lines - (hits - hits_left)
+        parts.append(HIT_LINE * due)
+        hits_left -= due
+        if i % 20 == 19:
+            parts.append(DISPLAY_BLOCK)
+    return "".join(parts)
+
+def hit_positions(text):
+    positions = []
+    pos = text.find("，")
+    while pos != -1:
+        positions.append(pos)
+        pos = text.find("，", pos + 1)
+    return positions
+
+def time_linear(spans, positions):
+    sample = positions if len(positions) <= LINEAR_SAMPLE else positions[::len(positions) // LINEAR_SAMPLE]
+    start = time.perf_counter()
+    for pos in sample:
+        any(span.outer_start < pos + 1 and pos < span.outer_end for span in spans)
+    elapsed = time.perf_counter() - start
+    return elapsed * len(positions) / len(sample), len(sample) < len(positions)
+
+def time_indexed(regions, positions):
+    start = time.perf_counter()
+    for pos in positions:
+        classify_hit(regions, pos, pos + 1, "text_only_strict")
+    return time.perf_counter() - start
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--spans", type=int, default=20000)
+    parser.add_argument("--hits", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    text = make_text(args.spans, args.hits)
+    positions = hit_positions(text)
+    start = time.perf_counter()
+    regions = classify_tex_regions(text)
+    classify = time.perf_counter() - start
+    linear, extrapolated = time_linear(regions.math_spans, positions)
+    indexed = time_indexed(regions, positions)
+
+    print(f"{len(text.encode('utf-8')) / 1024 / 1024:.1f}M, {len(regions.math_spans)} math spans, {len(positions)} hits")
+    print(f"{'classify_tex_regions':>24} {classify:9.3f}s")
+    print(f"{'linear overlap':>24} {('~' if extrapolated else '') + f'{linear:.3f}s':>10}")
+    print(f"{'interval index':>24} {indexed:9.3f}s")
+    for mode in SEARCH_MODES:
+        start = time.perf_counter()
+        result = check_tex_content("synthetic.tex", text, "，", False, mode)
+        elapsed = time.perf_counter() - start
+        print(f"{'check ' + mode:>24} {elapsed:9.3f}s  ({len(result['issues_list'])} issues)")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,87 @@
+"""Benchmark: whole-file check vs the chunked iter_tex_issues on a large file.
+
+    python benchmarks/bench_streaming.py [--size-mb 32] [--chunk-mb 4]
+
+Writes a generated table of the given size to a temporary .tex file and checks
+it both ways, reporting wall time, time to the first issue and the peak Python
+memory (tracemalloc; the memory-mapped file itself is not counted, as it is
+backed by the page cache). Times include the tracemalloc overhead.
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tex_char_checker_app import iter_tex_issues, read_tex_file, check_tex_content  # noqa: E402
+
+ROW = "生成データ {i} & $x_{{{i}}} = {i}.5$ & 値，{i} \\\\ % 注釈 $y$\n"
+HIT_EVERY = 50
+
+def write_table(path, size_bytes):
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\\begin{tabular}{lll}\n")
+        i = 0
+        while written < size_bytes:
+            block = "".join(ROW.format(i=i + j) if (i + j) % HIT_EVERY == 0 else ROW.format(i=i + j).replace("，", ",")
+                            for j in range(1000))
+            f.write(block)
+            written += len(block.encode("utf-8"))
+            i += 1000
+        f.write("\\end{tabular}\n")
+
+def measure(run):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    first, count = run(start)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, first, count, peak
+
+def run_whole(path, target):
+    def run(start):
+        content, _ = read_tex_file(path)
+        issues = check_tex_content(path, content, target, False, "text_only_strict")["issues_list"]
+        return time.perf_counter() - start, len(issues)
+    return run
+
+def run_streaming(path, target, chunk_size):
+    def run(start):
+        first = None
+        count = 0
+        for _ in iter_tex_issues(path, target, False, "text_only_strict", chunk_size=chunk_size):
+            if first is None:
+                first = time.perf_counter() - start
+            count += 1
+        return first, count
+    return run
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=32.0)
+    parser.add_argument("--chunk-mb", type=float, default=4.0)
+    args = parser.parse_args(argv)
+
+    fd, path = tempfile.mkstemp(suffix=".tex")
+    os.close(fd)
+    try:
+        write_table(path, int(args.size_mb * 1024 * 1024))
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"{size_mb:.1f}M file; issues are discarded as they arrive in the streaming run")
+        print(f"{'':>10} {'time':>9} {'first issue':>12} {'issues':>8} {'peak':>9}")
+        for name, run in (("whole", run_whole(path, "，")),
+                          ("streaming", run_streaming(path, "，", int(args.chunk_mb * 1024 * 1024)))):
+            elapsed, first, count, peak = measure(run)
+            print(f"{name:>10} {elapsed:8.2f}s {first:11.2f}s {count:8d} {peak / 1024 / 1024:8.1f}M")
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,191 @@
+"""Benchmark suite: every search mode on generated corpora, with a stored baseline.
+
+    python benchmarks/bench_suite.py [--size-mb 2] [--repeat 3] [--scenario NAME ...]
+    python benchmarks/bench_suite.py --save [PATH]       # record the issue counts
+    python benchmarks/bench_suite.py --compare [PATH]    # exit 1 if they changed
+    python benchmarks/bench_suite.py --against REV       # exit 1 on a slowdown vs REV
+
+For each scenario a file is generated with corpus_gen (same seed every run) and
+find_target_char_in_tex is run on it in each search mode. The table shows the
+best of ``--repeat`` runs as MB/s and hits/s, and the peak Python memory of one
+extra run under tracemalloc (timed runs are not traced).
+
+The baseline (default benchmarks/baseline.json) keeps the settings and the
+number of issues per scenario and mode, which do not depend on the machine;
+``--compare`` fails when any of them differs.
+
+Timings from another run, let alone another machine, are too noisy to compare
+against. ``--against REV`` instead loads tex_char_checker_app.py as of the git
+revision REV and times it in the same process, alternating runs of the two
+versions. It fails when the throughput of the working tree drops, or its peak
+memory grows, by more than ``--tolerance`` (default 25%) relative to REV.
+"""
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import tex_char_checker_app  # noqa: E402
+from corpus_gen import generate_tex  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+TARGET = "，"
+SEED = 0
+SCENARIOS = {
+    "paper": {},
+    "math_heavy": {"inline_math": 4.0, "display_math": 0.3},
+    "comment_heavy": {"comments": 0.6},
+    "hit_dense": {"hits": 3.0},
+    "unclosed": {"unclosed": 16},
+}
+
+def load_revision(rev, tmp):
+    """Import tex_char_checker_app.py as of git revision ``rev`` under another name."""
+    source = subprocess.run(["git", "show", f"{rev}:tex_char_checker_app.py"], cwd=ROOT,
+                            capture_output=True, check=True).stdout
+    path = os.path.join(tmp, "tex_char_checker_app_ref.py")
+    with open(path, "wb") as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location("tex_char_checker_app_ref", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def time_check(app, path, mode):
+    gc.collect()
+    start = time.perf_counter()
+    result = app.find_target_char_in_tex(path, TARGET, False, mode)
+    elapsed = time.perf_counter() - start
+    if result["error_message"]:
+        raise RuntimeError(result["error_message"])
+    return elapsed, len(result["issues_list"])
+
+def peak_memory(app, path, mode):
+    gc.collect()
+    tracemalloc.start()
+    app.find_target_char_in_tex(path, TARGET, False, mode)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def measure(apps, path, mode, repeat):
+    """Best time, issue count and peak memory of each app, alternating their runs so
+    that drift in the machine's speed hits all of them alike."""
+    best = [None] * len(apps)
+    issues = [None] * len(apps)
+    for _ in range(repeat):
+        for i, app in enumerate(apps):
+            elapsed, issues[i] = time_check(app, path, mode)
+            best[i] = elapsed if best[i] is None else min(best[i], elapsed)
+    return [(seconds, count, peak_memory(app, path, mode)) for app, seconds, count in zip(apps, best, issues)]
+
+def row(size_mb, seconds, issues, peak):
+    return {
+        "seconds": round(seconds, 4),
+        "mb_per_s": round(size_mb / seconds, 3),
+        "hits_per_s": round(issues / seconds, 1),
+        "issues": issues,
+        "peak_mb": round(peak / 1024 / 1024, 2),
+    }
+
+def run_suite(scenarios, size_bytes, repeat, reference=None):
+    """Return ``{"scenario|mode": row}`` for the working tree and, with a
+    ``reference`` module, the same for it (else None)."""
+    apps = [tex_char_checker_app] + ([reference] if reference is not None else [])
+    results = {}
+    reference_results = {} if reference is not None else None
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in scenarios:
+            path = os.path.join(tmp, f"{name}.tex")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(generate_tex(size_bytes, seed=SEED, **SCENARIOS[name]))
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            for mode in tex_char_checker_app.SEARCH_MODES:
+                measured = measure(apps, path, mode, repeat)
+                results[f"{name}|{mode}"] = row(size_mb, *measured[0])
+                if reference is not None:
+                    reference_results[f"{name}|{mode}"] = row(size_mb, *measured[1])
+    return results, reference_results
+
+def print_table(results, reference=None, rev=None):
+    print(f"{'scenario|mode':>32} {'MB/s':>8} {'hits/s':>10} {'issues':>7} {'peak':>8}" + (f"   vs {rev}" if reference else ""))
+    for key, result in results.items():
+        line = f"{key:>32} {result['mb_per_s']:8.2f} {result['hits_per_s']:10.0f} {result['issues']:7d} {result['peak_mb']:7.1f}M"
+        ref = (reference or {}).get(key)
+        if ref:
+            line += f"   {result['mb_per_s'] / ref['mb_per_s'] - 1:+6.1%} MB/s, {result['peak_mb'] - ref['peak_mb']:+.1f}M"
+            if result["issues"] != ref["issues"]:
+                line += f", {ref['issues']} issues"
+        print(line)
+
+def find_issue_changes(results, baseline):
+    return [f"{key}: {results[key]['issues']} issues, baseline {base['issues']}"
+            for key, base in baseline.items() if key in results and results[key]["issues"] != base["issues"]]
+
+def find_slowdowns(results, reference, tolerance, rev):
+    problems = []
+    for key, result in results.items():
+        ref = reference[key]
+        if result["mb_per_s"] < ref["mb_per_s"] * (1 - tolerance):
+            problems.append(f"{key}: {result['mb_per_s']:.2f} MB/s, {rev} {ref['mb_per_s']:.2f} MB/s")
+        if result["peak_mb"] > ref["peak_mb"] * (1 + tolerance):
+            problems.append(f"{key}: peak {result['peak_mb']:.1f}M, {rev} {ref['peak_mb']:.1f}M")
+    return problems
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=2.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these scenarios")
+    parser.add_argument("--save", nargs="?", const=DEFAULT_BASELINE, metavar="PATH", help="write the issue counts as the baseline")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, metavar="PATH", help="compare the issue counts with a baseline")
+    parser.add_argument("--against", metavar="REV", help="time the checker at this git revision in the same run")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    settings = {"size_mb": args.size_mb, "seed": SEED, "target": TARGET}
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            recorded = json.load(f)
+        if recorded["settings"] != settings:
+            parser.error(f"baseline was recorded with {recorded['settings']}, not {settings}")
+        baseline = recorded["results"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            reference = load_revision(args.against, tmp) if args.against else None
+        except subprocess.CalledProcessError as e:
+            parser.error(f"cannot load {args.against}: {e.stderr.decode(errors='replace').strip()}")
+        results, reference_results = run_suite(args.scenario or list(SCENARIOS), int(args.size_mb * 1024 * 1024),
+                                               args.repeat, reference)
+    print_table(results, reference_results, args.against)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"settings": settings, "results": {key: {"issues": result["issues"]} for key, result in results.items()}},
+                      f, indent=1, sort_keys=True)
+        print(f"Recorded {len(results)} issue counts to {args.save}")
+    problems = []
+    if baseline is not None:
+        problems += find_issue_changes(results, baseline)
+    if reference_results is not None:
+        problems += find_slowdowns(results, reference_results, args.tolerance, args.against)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if baseline is not None or reference_results is not None:
+        print(f"{len(results)} results, {len(problems)} regression(s)")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,121 @@
+"""Synthetic TeX corpus generator for the benchmarks.
+
+    python benchmarks/corpus_gen.py OUT_DIR [--files 10] [--size-kb 256] [--seed 0]
+                                    [--inline-math 1.0] [--display-math 0.05]
+                                    [--comments 0.1] [--hits 0.2] [--unclosed 0]
+
+All densities are per line of body text:
+
+- ``inline_math``: average number of ``$...$`` spans on a line,
+- ``display_math``: chance that a display block (align, equation, ``\\[...\\]``)
+  follows the line,
+- ``comments``: chance that the line has a comment (half of them full-line),
+- ``hits``: average number of ``，`` on a line (in text or, for a third of
+  them, inside inline math),
+- ``unclosed``: number of environments / ``$`` left open, spread evenly over
+  the text; each one turns the rest of its file into math.
+
+The output only depends on the arguments, so a seed reproduces a corpus exactly.
+"""
+import argparse
+import os
+import random
+import sys
+
+HIT = "，"
+WORDS = ["本文", "ここで", "定理", "証明", "関数", "変数", "値", "集合", "次の", "条件", "を満たす", "とする", "について", "考える"]
+INLINE_BODIES = ["x_{%d}", "\\alpha + \\beta", "f(x) = x^2", "\\frac{a}{b}", "\\sum_{i=1}^{n} a_i", "\\text{if } x > 0", "y_{%d}^2"]
+DISPLAY_BLOCKS = [
+    "\\begin{align}\n  a_{%d} &= b + c, \\\\\n  d &= e %% 注釈 $f$\n\\end{align}\n",
+    "\\begin{equation}\n  \\int_0^1 f(x)\\,dx = %d\n\\end{equation}\n",
+    "\\[\n  \\sum_{k=0}^{%d} k = \\frac{n(n+1)}{2}\n\\]\n",
+]
+COMMENT_TEXTS = ["TODO: 見直す", "注釈 $x$ と，", "\\begin{equation} 未使用", "メモ"]
+UNCLOSED_OPENERS = ["\\begin{equation}\n", "\\begin{align}\n", "$ ", "\\[\n"]
+
+def _sentence(rng, n):
+    return "".join(rng.choice(WORDS) for _ in range(n))
+
+def _inline_math(rng, i, with_hit=False):
+    body = rng.choice(INLINE_BODIES)
+    if "%d" in body:
+        body = body % i
+    return f"${body}{HIT + 'y' if with_hit else ''}$"
+
+def _count(rng, density):
+    """Integer part of ``density`` plus one more with the fractional chance."""
+    whole = int(density)
+    return whole + (rng.random() < density - whole)
+
+def generate_tex(size_bytes, inline_math=1.0, display_math=0.05, comments=0.1, hits=0.2, unclosed=0, seed=0):
+    """Return a synthetic .tex document of about ``size_bytes`` UTF-8 bytes."""
+    rng = random.Random(seed)
+    parts = ["\\documentclass{article}\n\\begin{document}\n"]
+    size = sum(len(part.encode("utf-8")) for part in parts)
+    # Byte offsets at which to leave an environment open, spread evenly.
+    unclosed_at = [size_bytes * (k + 1) // (unclosed + 1) for k in range(unclosed)]
+    i = 0
+    while size < size_bytes:
+        pieces = [_sentence(rng, 3)]
+        for _ in range(_count(rng, inline_math)):
+            pieces.append(_inline_math(rng, i))
+            pieces.append(_sentence(rng, 2))
+        for _ in range(_count(rng, hits)):
+            if rng.random() < 1 / 3:
+                pieces.append(_inline_math(rng, i, with_hit=True))
+            else:
+                pieces.insert(rng.randrange(len(pieces) + 1), HIT)
+        line = " ".join(pieces)
+        if rng.random() < comments:
+            if rng.random() < 0.5:
+                line = "% " + line
+            else:
+                line += " % " + rng.choice(COMMENT_TEXTS)
+        block = line + "\n"
+        if rng.random() < display_math:
+            template = rng.choice(DISPLAY_BLOCKS)
+            block += template.replace("%d", str(i)).replace("%%", "%")
+        while unclosed_at and size >= unclosed_at[0]:
+            unclosed_at.pop(0)
+            block += rng.choice(UNCLOSED_OPENERS)
+        parts.append(block)
+        size += len(block.encode("utf-8"))
+        i += 1
+    parts.append("\\end{document}\n")
+    return "".join(parts)
+
+def write_corpus(out_dir, files, size_bytes, seed=0, **densities):
+    """Write ``files`` generated documents to ``out_dir`` and return their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for n in range(files):
+        path = os.path.join(out_dir, f"synthetic_{n:03d}.tex")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(generate_tex(size_bytes, seed=seed + n, **densities))
+        paths.append(path)
+    return paths
+
+def add_density_arguments(parser):
+    parser.add_argument("--inline-math", type=float, default=1.0, help="inline math spans per line")
+    parser.add_argument("--display-math", type=float, default=0.05, help="display blocks per line")
+    parser.add_argument("--comments", type=float, default=0.1, help="commented lines per line")
+    parser.add_argument("--hits", type=float, default=0.2, help="target hits per line")
+    parser.add_argument("--unclosed", type=int, default=0, help="unclosed environments per file")
+
+def density_arguments(args):
+    return {"inline_math": args.inline_math, "display_math": args.display_math, "comments": args.comments,
+            "hits": args.hits, "unclosed": args.unclosed}
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--files", type=int, default=10)
+    parser.add_argument("--size-kb", type=float, default=256.0)
+    parser.add_argument("--seed", type=int, default=0)
+    add_density_arguments(parser)
+    args = parser.parse_args(argv)
+    paths = write_corpus(args.out_dir, args.files, int(args.size_kb * 1024), args.seed, **density_arguments(args))
+    print(f"wrote {len(paths)} files to {args.out_dir}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,217 @@
+"""Compare find_target_char_in_tex against the recorded results for the corpus.
+
+    python regression/check_regression.py               # compare, exit 1 on mismatch
+    python regression/check_regression.py --update REV  # re-record the expected results
+
+expected.json holds the output of the original regex based detection, the
+tex_char_checker_app.py of git revision REV (the first commit). Where the region
+scanner differs from it on purpose, the scanner's output is kept in
+intended_deltas.json together with the reason, per corpus file, under
+"reasons". A clean run shows that all three search modes report the regex
+results except for those documented deltas. ``--update`` records both files,
+but only keeps deltas for files that have a reason; any other difference is
+printed and fails the update.
+
+The regex detection had no working "ignore \\text{} etc." option, so the
+corpus and ignored/*.tex are also checked with the default ignored commands
+(``True``) and with an explicit command list, whole and in small streamed
+chunks, against expected_ignored.json. ``--update`` records that file from the
+working tree; check the diff by hand before committing it.
+
+The rules in rules/rules.json are also run as one RuleSet over the corpus and
+rules/*.tex, both whole and in small streamed chunks. The hits of each rule must
+equal its own pattern's finditer, restricted to the rule's scope (and, for a
+consistency rule, to the variants other than the preferred one), so a rule the
+combined scan skips or misplaces shows up here.
+"""
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import tex_char_checker_app  # noqa: E402
+from tex_char_checker_app import RuleSet, classify_hit, classify_tex_regions, find_target_char_in_tex, iter_tex_issues  # noqa: E402
+
+CORPUS_DIR = os.path.join(HERE, "corpus")
+EXPECTED_PATH = os.path.join(HERE, "expected.json")
+DELTAS_PATH = os.path.join(HERE, "intended_deltas.json")
+IGNORED_DIR = os.path.join(HERE, "ignored")
+EXPECTED_IGNORED_PATH = os.path.join(HERE, "expected_ignored.json")
+IGNORE_FLAGS = {"default": True, "custom": "mbox, \\foo, operatorname"}
+RULES_DIR = os.path.join(HERE, "rules")
+RULES_PATH = os.path.join(RULES_DIR, "rules.json")
+# Small enough that every test file is streamed in several chunks.
+STREAM_CHUNK_SIZE = 64
+TARGETS = ["，", ",", "$"]
+SEARCH_MODES = ["math_only", "text_only_strict", "document_wide"]
+# Issue fields present when expected.json was recorded; fields added later are not compared.
+RECORDED_ISSUE_KEYS = ["file", "line", "col", "type", "context", "char_pos", "detected_char"]
+
+def load_revision(rev, tmp):
+    """Import tex_char_checker_app.py as of git revision ``rev`` under another name."""
+    source = subprocess.run(["git", "show", f"{rev}:tex_char_checker_app.py"], cwd=os.path.dirname(HERE),
+                            capture_output=True, check=True).stdout
+    path = os.path.join(tmp, "tex_char_checker_app_regex.py")
+    with open(path, "wb") as f:
+        f.write(source)
+    spec = importlib.util.spec_from_file_location("tex_char_checker_app_regex", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def collect_results(app=tex_char_checker_app):
+    results = {}
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        if not filename.endswith(".tex"):
+            continue
+        filepath = os.path.join(CORPUS_DIR, filename)
+        for target in TARGETS:
+            for mode in SEARCH_MODES:
+                result = app.find_target_char_in_tex(filepath, target, False, mode)
+                results[f"{filename}|{target}|{mode}"] = {"error_message": result["error_message"],
+                                                          "issues_list": recorded_issues(filename, result["issues_list"])}
+    return results
+
+def recorded_issues(filename, issues):
+    recorded = []
+    for issue in issues:
+        issue = {key: issue[key] for key in RECORDED_ISSUE_KEYS}
+        issue["file"] = filename
+        recorded.append(issue)
+    return recorded
+
+def collect_ignored_results(streamed=False):
+    results = {}
+    for directory in (CORPUS_DIR, IGNORED_DIR):
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(".tex"):
+                continue
+            filepath = os.path.join(directory, filename)
+            for name, flag in IGNORE_FLAGS.items():
+                for target in TARGETS:
+                    for mode in SEARCH_MODES:
+                        if streamed:
+                            result = {"error_message": None,
+                                      "issues_list": list(iter_tex_issues(filepath, target, flag, mode, chunk_size=STREAM_CHUNK_SIZE))}
+                        else:
+                            result = find_target_char_in_tex(filepath, target, flag, mode)
+                        results[f"{filename}|{name}|{target}|{mode}"] = {
+                            "error_message": result["error_message"], "issues_list": recorded_issues(filename, result["issues_list"])}
+    return results
+
+def compare(expected, results, label=""):
+    mismatches = 0
+    for key in sorted(set(expected) | set(results)):
+        if expected.get(key) != results.get(key):
+            mismatches += 1
+            print(f"MISMATCH {label}{key}")
+            print(f"  expected: {json.dumps(expected.get(key), ensure_ascii=False)}")
+            print(f"  actual:   {json.dumps(results.get(key), ensure_ascii=False)}")
+    return mismatches
+
+def rule_reference_hits(rule_set, content):
+    """``{rule id: [(char_pos, detected_char), ...]}`` from each rule's own finditer."""
+    regions = classify_tex_regions(content)
+    hits = {}
+    for rule in rule_set.rules:
+        matches = [m for m in rule.pattern.finditer(content) if classify_hit(regions, m.start(), m.end(), rule.search_mode)]
+        if rule.variants:
+            counts = Counter(rule.variant_of(m.group()) for m in matches)
+            preferred = rule.prefer or max(rule.variants, key=lambda variant: counts[variant])
+            matches = [m for m in matches if rule.variant_of(m.group()) != preferred]
+        hits[rule.id] = [(m.start(), m.group()) for m in matches]
+    return hits
+
+def rule_hits(issues):
+    hits = {}
+    for issue in issues:
+        hits.setdefault(issue.rule.id, []).append((issue.char_pos, issue.detected_char))
+    return {rule_id: sorted(rule_issues) for rule_id, rule_issues in hits.items()}
+
+def check_rules():
+    """Compare every rule against its reference hits; return (cases, mismatches)."""
+    rule_set = RuleSet.load(RULES_PATH)
+    filepaths = [os.path.join(directory, filename)
+                 for directory in (CORPUS_DIR, RULES_DIR) for filename in sorted(os.listdir(directory)) if filename.endswith(".tex")]
+    cases = mismatches = 0
+    for filepath in filepaths:
+        with open(filepath, encoding="utf-8") as f:
+            content = f.read()
+        expected = rule_reference_hits(rule_set, content)
+        result = find_target_char_in_tex(filepath, rule_set, False, "document_wide")
+        actual = {
+            "whole": rule_hits(result["issues_list"]),
+            "streamed": rule_hits(iter_tex_issues(filepath, rule_set, False, "document_wide", chunk_size=STREAM_CHUNK_SIZE)),
+        }
+        for rule in rule_set.rules:
+            for how, hits in actual.items():
+                cases += 1
+                if hits.get(rule.id, []) != expected[rule.id]:
+                    mismatches += 1
+                    print(f"RULE MISMATCH {os.path.relpath(filepath, HERE)}|{rule.id}|{how}")
+                    print(f"  expected: {json.dumps(expected[rule.id], ensure_ascii=False)}")
+                    print(f"  actual:   {json.dumps(hits.get(rule.id, []), ensure_ascii=False)}")
+    return cases, mismatches
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+def update(rev, results):
+    with tempfile.TemporaryDirectory() as tmp:
+        regex_results = collect_results(load_revision(rev, tmp))
+    reasons = load_json(DELTAS_PATH, {"reasons": {}})["reasons"]
+    deltas = {}
+    undocumented = 0
+    for key in sorted(results):
+        if results[key] == regex_results.get(key):
+            continue
+        if key.split("|")[0] in reasons:
+            deltas[key] = results[key]
+        else:
+            undocumented += 1
+            print(f"UNDOCUMENTED DELTA {key}")
+    ignored_results = collect_ignored_results()
+    write_json(EXPECTED_PATH, regex_results)
+    write_json(DELTAS_PATH, {"reasons": reasons, "results": deltas})
+    write_json(EXPECTED_IGNORED_PATH, ignored_results)
+    print(f"Recorded {len(regex_results)} cases from {rev} to {EXPECTED_PATH}, {len(deltas)} intended deltas to {DELTAS_PATH}")
+    print(f"Recorded {len(ignored_results)} ignored-command cases to {EXPECTED_IGNORED_PATH}")
+    return 1 if undocumented else 0
+
+def main(argv):
+    results = collect_results()
+    if argv[:1] == ["--update"]:
+        if len(argv) != 2:
+            print("usage: check_regression.py --update REV", file=sys.stderr)
+            return 2
+        return update(argv[1], results)
+
+    expected = load_json(EXPECTED_PATH, {})
+    expected.update(load_json(DELTAS_PATH, {"results": {}})["results"])
+    mismatches = compare(expected, results)
+    print(f"{len(results)} cases, {mismatches} mismatch(es)")
+    expected_ignored = load_json(EXPECTED_IGNORED_PATH, {})
+    ignored_mismatches = 0
+    for how in ("whole", "streamed"):
+        ignored_results = collect_ignored_results(streamed=how == "streamed")
+        ignored_mismatches += compare(expected_ignored, ignored_results, f"{how}|")
+    print(f"{len(ignored_results)} ignored-command cases x2, {ignored_mismatches} mismatch(es)")
+    rule_cases, rule_mismatches = check_rules()
+    print(f"{rule_cases} rule cases, {rule_mismatches} mismatch(es)")
+    return 1 if mismatches or ignored_mismatches or rule_mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
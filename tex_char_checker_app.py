@@ -1,155 +1,2135 @@
-import tkinter as tk
-from tkinter import filedialog, scrolledtext, messagebox, ttk
 import re
 import os
+import sys
+import json
+import argparse
+import select
+import struct
+import hashlib
+import marshal
+import sqlite3
+import time
+import zlib
+import bisect
+import codecs
+import fnmatch
+import heapq
+import itertools
+import mmap
+from array import array
+import queue
+import threading
+from collections import namedtuple
 
-# --- Utility Functions (no changes from previous) ---
-def get_line_col_from_pos(text, pos):
-    if pos > len(text): pos = len(text)
-    line_num = text.count('\n', 0, pos) + 1
-    prev_newline_pos = text.rfind('\n', 0, pos)
-    col_num = pos - prev_newline_pos if prev_newline_pos != -1 else pos + 1
-    return line_num, col_num
-
-def get_context_line_from_pos(text, pos):
-    if pos > len(text): pos = len(text)
-    start_of_line = text.rfind('\n', 0, pos) + 1
-    end_of_line = text.find('\n', pos)
-    if end_of_line == -1: end_of_line = len(text)
-    return text[start_of_line:end_of_line]
-
-def is_in_comment_on_line(text_content, char_to_check_pos, search_start_offset=0):
-    line_start_pos = text_content.rfind('\n', 0, char_to_check_pos) + 1
-    current_search_offset_abs = line_start_pos
-    while current_search_offset_abs < char_to_check_pos:
-        try:
-            comment_char_abs_pos = text_content.index('%', current_search_offset_abs, char_to_check_pos)
-        except ValueError:
-            return False
-        num_backslashes = 0
-        temp_idx = comment_char_abs_pos - 1
-        while temp_idx >= line_start_pos and text_content[temp_idx] == '\\':
-            num_backslashes += 1
-            temp_idx -= 1
-        if num_backslashes % 2 == 0:
-            return True 
-        current_search_offset_abs = comment_char_abs_pos + 1
-    return False
+# tkinter is imported by load_tk() only when the GUI starts, and the process pool
+# modules only when a pool is needed, so a headless CLI run starts quickly.
+tk = filedialog = messagebox = ttk = None
+
+def load_tk():
+    global tk, filedialog, messagebox, ttk
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+
+# --- Utility Functions ---
+_NEWLINE_RE = re.compile('\n')
+
+class LineIndex:
+    """Start offsets of every line of ``text``, built in one pass, so that line/column
+    and line text lookups are a bisect instead of a rescan from the file start."""
+    def __init__(self, text):
+        self.text = text
+        self.line_starts = array('I' if len(text) < 2**32 else 'Q', [0])
+        self.line_starts.extend(m.end() for m in _NEWLINE_RE.finditer(text))
+
+    def line_of(self, pos):
+        """1-based line number containing ``pos``."""
+        return bisect.bisect_right(self.line_starts, pos)
+
+    def line_start(self, line_num):
+        return self.line_starts[line_num - 1]
+
+    def line_col(self, pos):
+        if pos > len(self.text): pos = len(self.text)
+        line_num = bisect.bisect_right(self.line_starts, pos)
+        return line_num, pos - self.line_starts[line_num - 1] + 1
+
+    def line_text(self, line_num):
+        start = self.line_starts[line_num - 1]
+        end = self.line_starts[line_num] - 1 if line_num < len(self.line_starts) else len(self.text)
+        return self.text[start:end]
+
+def is_escaped(text, pos, backslash='\\'):
+    """True if ``text[pos]`` follows an odd number of backslashes. ``text`` may be a
+    str, bytes or mmap (with ``backslash=b'\\\\'``)."""
+    count = 0
+    while pos > count and text[pos - count - 1:pos - count] == backslash:
+        count += 1
+    return count % 2 == 1
+
+def find_unescaped(text, sub, start=0):
+    """``text.find(sub, start)``, skipping occurrences escaped by a backslash."""
+    pos = text.find(sub, start)
+    while pos != -1 and is_escaped(text, pos):
+        pos = text.find(sub, pos + 1)
+    return pos
+
+SNIPPET_WINDOW = 15
+
+def build_issue_snippet(line_text, col, detected_char):
+    """Return ``line_text`` (the unstripped line of the hit) cut to the hit at ``col``
+    and its neighbourhood, with the hit marked as ``>>>X<<<``."""
+    start = col - 1
+    end = min(len(line_text), start + len(detected_char))
+    display_start = max(0, start - SNIPPET_WINDOW)
+    display_end = min(len(line_text), end + SNIPPET_WINDOW)
+    return (f"{'...' if display_start > 0 else ''}"
+            f"{line_text[display_start:start]}>>>{line_text[start:end]}<<<{line_text[end:display_end]}"
+            f"{'...' if display_end < len(line_text) else ''}")
+
+# --- TeX Region Classification ---
+MATH_ENV_NAMES = frozenset(
+    name + star
+    for name in ("equation", "align", "gather", "multline", "eqnarray", "displaymath", "math", "subequations")
+    for star in ("", "*")
+)
+# Environments whose body is taken verbatim: '%' and '$' inside them are plain characters.
+VERBATIM_ENV_NAMES = frozenset(("verbatim", "verbatim*", "Verbatim", "Verbatim*", "lstlisting", "minted"))
+# Environments whose body is dropped like a comment (comment package).
+COMMENT_ENV_NAMES = frozenset(("comment",))
+# Commands whose braced argument switches back to text mode inside math, so a '$' there does not close the math.
+TEXT_MODE_COMMANDS = frozenset(("text", "mbox", "hbox", "textrm", "textnormal", "textbf", "textit", "textsf", "texttt", "intertext"))
+# Commands whose braced argument is skipped by math_only checks when ignoring \text{} etc. is enabled.
+DEFAULT_IGNORED_TEXT_COMMANDS = TEXT_MODE_COMMANDS | frozenset(("mathrm", "operatorname"))
+
+_TEXT_SPECIAL_RE = re.compile(r"[\\%$]")
+_MATH_SPECIAL_RE = re.compile(r"[\\%${}]")
+# Inline math with no command, comment or nested '$' inside: needs no state, so it is taken whole.
+_PLAIN_INLINE_MATH_RE = re.compile(r"\$[^$\\%]*\$")
+_CONTROL_SEQ_RE = re.compile(r"\\(?:([A-Za-z]+)|(.)|$)", re.DOTALL)
+_ENV_ARG_RE = re.compile(r"\{([^{}\n]*)\}")
+# File inclusion commands followed by classify_tex_regions' include_handler.
+INCLUDE_COMMANDS = frozenset(("input", "include", "subfile", "subfileinclude"))
+# "{file}", or for \input also the primitive form "\input file".
+_INCLUDE_ARG_RE = re.compile(r"[ \t]*\{([^{}\n]*)\}|[ \t]+([^\s{}%\\]+)")
+
+MathSpan = namedtuple("MathSpan", ["outer_start", "inner_start", "inner_end", "outer_end", "label"])
+
+def merge_intervals(*span_lists):
+    """Merge sorted ``(start, end)`` lists into ``(starts, ends)`` of sorted,
+    non-overlapping intervals; overlapping or touching intervals are coalesced."""
+    starts = []
+    ends = []
+    for start, end in heapq.merge(*span_lists):
+        if ends and start <= ends[-1]:
+            if end > ends[-1]:
+                ends[-1] = end
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+class TexRegions:
+    """Classification of a TeX source produced by a single left-to-right scan.
+
+    Every offset is either in a comment, in math (one of ``math_spans``) or plain text.
+    Both span lists are sorted and non-overlapping; comments inside math are listed in
+    ``comment_spans`` as well. ``ignored_spans`` are the ignored command groups found
+    inside math, from the backslash to the closing brace (outermost groups only).
+
+    :meth:`text_blocked_at` and :meth:`math_piece_at` answer the per-hit questions of the
+    search modes with one binary search each, on interval lists merged once per file.
+    """
+    def __init__(self, comment_spans, math_spans, ignored_spans=(), exit_math=None, resume_state=None):
+        self.comment_spans = comment_spans
+        self.math_spans = math_spans
+        self.ignored_spans = ignored_spans
+        # (closer, label) of a math block still open at the end of the text, else None.
+        self.exit_math = exit_math
+        # Full scanner state at the end of the text, to continue with the next chunk.
+        self.resume_state = resume_state
+        self._comment_starts = [start for start, _ in comment_spans]
+        self._math_starts = [span.outer_start for span in math_spans]
+        self._ignored_starts = [start for start, _ in ignored_spans]
+        self._text_blocked = None
+        self._math_pieces = None
+
+    def in_comment(self, pos):
+        idx = bisect.bisect_right(self._comment_starts, pos) - 1
+        return idx >= 0 and pos < self.comment_spans[idx][1]
+
+    def math_span_at(self, pos):
+        idx = bisect.bisect_right(self._math_starts, pos) - 1
+        if idx >= 0 and pos < self.math_spans[idx].outer_end:
+            return self.math_spans[idx]
+        return None
+
+    def overlaps_math(self, start, end):
+        idx = bisect.bisect_left(self._math_starts, end) - 1
+        return idx >= 0 and self.math_spans[idx].outer_end > start
+
+    def in_ignored(self, pos):
+        idx = bisect.bisect_right(self._ignored_starts, pos) - 1
+        return idx >= 0 and pos < self.ignored_spans[idx][1]
+
+    def text_blocked_at(self, pos):
+        """True if ``pos`` is in a comment or anywhere inside a math span (delimiters included)."""
+        if self._text_blocked is None:
+            self._text_blocked = merge_intervals(
+                self.comment_spans, [(span.outer_start, span.outer_end) for span in self.math_spans])
+        starts, ends = self._text_blocked
+        idx = bisect.bisect_right(starts, pos) - 1
+        return idx >= 0 and pos < ends[idx]
+
+    def math_piece_at(self, pos):
+        """Return the math span whose body contains ``pos`` outside any comment or
+        ignored group, else None."""
+        if self._math_pieces is None:
+            self._math_pieces = self._build_math_pieces()
+        starts, ends, span_indexes = self._math_pieces
+        idx = bisect.bisect_right(starts, pos) - 1
+        if idx >= 0 and pos < ends[idx]:
+            return self.math_spans[span_indexes[idx]]
+        return None
+
+    def _build_math_pieces(self):
+        # Cut each math body into the pieces left after removing comments and ignored
+        # groups, with one forward sweep over the spans and the merged holes.
+        hole_starts, hole_ends = merge_intervals(self.comment_spans, self.ignored_spans)
+        starts = []
+        ends = []
+        span_indexes = []
+        hole = 0
+        for span_index, span in enumerate(self.math_spans):
+            pos, inner_end = span.inner_start, span.inner_end
+            while hole < len(hole_ends) and hole_ends[hole] <= pos:
+                hole += 1
+            while pos < inner_end:
+                if hole < len(hole_starts) and hole_starts[hole] < inner_end:
+                    if hole_starts[hole] > pos:
+                        starts.append(pos)
+                        ends.append(hole_starts[hole])
+                        span_indexes.append(span_index)
+                    pos = hole_ends[hole]
+                    if hole_ends[hole] <= inner_end:
+                        hole += 1
+                else:
+                    starts.append(pos)
+                    ends.append(inner_end)
+                    span_indexes.append(span_index)
+                    pos = inner_end
+        return starts, ends, span_indexes
+
+def classify_tex_regions(content, ignored_commands=frozenset(), include_handler=None, entry_math=None,
+                         resume_state=None, closer_after_end=None):
+    """Scan ``content`` once and return its :class:`TexRegions`.
+
+    Handles ``%`` comments, escaped ``\\%``/``\\$``, ``$...$``, ``$$...$$``, ``\\[...\\]``,
+    the environments in ``MATH_ENV_NAMES``, verbatim environments, ``\\verb`` and nested
+    ``\\text{...}`` groups inside math. A math opener without any closer later in the file
+    (escaped closers such as ``\\$`` do not count) is treated as plain text, like the
+    regex based detection it replaces.
+    Braced arguments of ``ignored_commands`` inside math are collected into
+    ``ignored_spans`` during the same scan, using the brace depth already tracked there.
+
+    To follow a document across files, ``entry_math`` starts the scan inside a math
+    block (a ``(closer, label)`` pair, as in ``TexRegions.exit_math``), and
+    ``include_handler(command, argument, site_start, site_end, math_state)`` is called
+    for every ``\\input``/``\\include``/``\\subfile`` outside comments. It returns the
+    math state after the included file, in which the scan continues if this file
+    has the matching closer later (brace groups open at the include site are not
+    carried into or out of the included file). A file entered in math may leave an
+    opener unclosed for its includer to close; it is then reported in ``exit_math``.
+
+    To scan a file in line-aligned chunks, pass the previous chunk's
+    ``TexRegions.resume_state`` as ``resume_state`` and a ``closer_after_end(closer)``
+    that tells whether ``closer`` occurs after the end of ``content``.
+    """
+    comment_spans = []
+    math_spans = []
+    ignored_spans = []
+    length = len(content)
+    next_closer_pos = {}
+    exit_math = None
+    end_state = None
+
+    def has_closer(closer, start):
+        if entry_math is not None and include_handler is not None:
+            return True
+        # Scan positions only grow, so one find per closer is reused until it is passed.
+        cached = next_closer_pos.get(closer)
+        if cached is None or (cached != -1 and cached < start):
+            cached = find_unescaped(content, closer, start)
+            next_closer_pos[closer] = cached
+        if cached == -1 and closer_after_end is not None:
+            return closer_after_end(closer)
+        return cached != -1
+
+    def skip_comment(pos):
+        end = content.find('\n', pos)
+        end = length if end == -1 else end + 1
+        comment_spans.append((pos, end))
+        return end
+
+    def include_site(cm, math_state):
+        # Returns (site_end, math state after the included file), or None if cm is no include.
+        am = _INCLUDE_ARG_RE.match(content, cm.end())
+        if not am or (am.group(2) is not None and cm.group(1) != 'input'):
+            return None
+        argument = am.group(1) if am.group(1) is not None else am.group(2)
+        after = include_handler(cm.group(1), argument, cm.start(), am.end(), math_state)
+        if after is not None and after != math_state and content.find(after[0], am.end()) == -1:
+            after = None  # math opened by the included file is never closed here
+        return am.end(), after
+
+    def skip_env_body(start, closer, is_comment):
+        nonlocal end_state
+        end = content.find(closer, start)
+        if end == -1:
+            end_state = ("skip", closer, is_comment)
+            return length
+        return end + len(closer)
+
+    def scan_math(outer_start, inner_start, closer, label, brace_depth=0, text_group_depths=(), ignored_depth=None):
+        nonlocal exit_math, end_state
+        pos = inner_start
+        text_group_depths = list(text_group_depths)
+        ignored_start = None if ignored_depth is None else inner_start
+
+        def end_math(inner_end, outer_end):
+            # An ignored group left open by the closer ends with the math.
+            if ignored_depth is not None:
+                ignored_spans.append((ignored_start, inner_end))
+            math_spans.append(MathSpan(outer_start, inner_start, inner_end, outer_end, label))
+            return outer_end
+
+        while True:
+            m = _MATH_SPECIAL_RE.search(content, pos)
+            if not m:
+                exit_math = (closer, label)
+                end_state = ("math", closer, label, brace_depth, tuple(text_group_depths), ignored_depth)
+                return end_math(length, length)
+            i = m.start()
+            ch = content[i]
+            if ch == '%':
+                pos = skip_comment(i)
+            elif ch == '{':
+                brace_depth += 1
+                pos = i + 1
+            elif ch == '}':
+                brace_depth -= 1
+                if text_group_depths and brace_depth <= text_group_depths[-1]:
+                    text_group_depths.pop()
+                if ignored_depth is not None and brace_depth <= ignored_depth:
+                    ignored_spans.append((ignored_start, i + 1))
+                    ignored_start = ignored_depth = None
+                pos = i + 1
+            elif ch == '$':
+                if text_group_depths or closer[0] != '$':
+                    pos = i + 1
+                elif closer == '$$' and not content.startswith('$$', i):
+                    pos = i + 1
+                else:
+                    # A '$$' met in inline math closes it at the first '$'; the second reopens in text mode.
+                    return end_math(i, i + len(closer))
+            else:
+                cm = _CONTROL_SEQ_RE.match(content, i)
+                name = cm.group(1)
+                if (cm.group(2) == ']' and closer == '\\]') or (name == 'end' and content.startswith(closer, i)):
+                    return end_math(i, i + len(closer))
+                site = include_site(cm, (closer, label)) if include_handler and name in INCLUDE_COMMANDS else None
+                if site is not None and site[1] != (closer, label):
+                    # The included file closed this math block.
+                    end_math(i, i)
+                    if site[1] is None:
+                        return site[0]
+                    return scan_math(site[0], site[0], *site[1])
+                if site is not None:
+                    pos = site[0]
+                    continue
+                is_text_mode = name in TEXT_MODE_COMMANDS
+                is_ignored = ignored_depth is None and name in ignored_commands
+                if is_text_mode or is_ignored:
+                    after = cm.end()
+                    # Starred forms such as \operatorname*{...} take the same argument.
+                    if after < length and content[after] == '*':
+                        after += 1
+                    while after < length and content[after] in ' \t':
+                        after += 1
+                    if after < length and content[after] == '{':
+                        if is_text_mode:
+                            text_group_depths.append(brace_depth)
+                        if is_ignored:
+                            ignored_start, ignored_depth = i, brace_depth
+                pos = cm.end()
+
+    if resume_state is None:
+        pos = scan_math(0, 0, *entry_math) if entry_math is not None else 0
+    elif resume_state[0] == "math":
+        pos = scan_math(0, 0, *resume_state[1:])
+    else:
+        pos = skip_env_body(0, resume_state[1], resume_state[2])
+        if resume_state[2]:
+            comment_spans.append((0, pos))
+    while True:
+        m = _TEXT_SPECIAL_RE.search(content, pos)
+        if not m:
+            break
+        i = m.start()
+        ch = content[i]
+        if ch == '%':
+            pos = skip_comment(i)
+        elif ch == '$':
+            if content.startswith('$$', i):
+                pos = scan_math(i, i + 2, '$$', "display math $$") if has_closer('$$', i + 2) else i + 2
+            else:
+                pm = _PLAIN_INLINE_MATH_RE.match(content, i)
+                if pm:
+                    pos = pm.end()
+                    math_spans.append(MathSpan(i, i + 1, pos - 1, pos, "inline math $"))
+                else:
+                    pos = scan_math(i, i + 1, '$', "inline math $") if has_closer('$', i + 1) else i + 1
+        else:
+            cm = _CONTROL_SEQ_RE.match(content, i)
+            name = cm.group(1)
+            pos = cm.end()
+            if cm.group(2) == '[':
+                if has_closer('\\]', pos):
+                    pos = scan_math(i, pos, '\\]', "display math \\[\\]")
+            elif include_handler is not None and name in INCLUDE_COMMANDS:
+                site = include_site(cm, None)
+                if site is not None:
+                    # Math opened by the included file continues after the include site.
+                    pos = site[0] if site[1] is None else scan_math(site[0], site[0], *site[1])
+            elif name == 'begin':
+                am = _ENV_ARG_RE.match(content, pos)
+                if not am:
+                    continue
+                env_name = am.group(1)
+                closer = '\\end{%s}' % env_name
+                if env_name in MATH_ENV_NAMES:
+                    if has_closer(closer, am.end()):
+                        pos = scan_math(i, am.end(), closer, env_name)
+                elif env_name in VERBATIM_ENV_NAMES or env_name in COMMENT_ENV_NAMES:
+                    pos = skip_env_body(am.end(), closer, env_name in COMMENT_ENV_NAMES)
+                    if env_name in COMMENT_ENV_NAMES:
+                        comment_spans.append((i, pos))
+            elif name == 'verb':
+                delim_pos = pos + 1 if content.startswith('*', pos) else pos
+                if delim_pos < length and not content[delim_pos].isspace():
+                    close = content.find(content[delim_pos], delim_pos + 1)
+                    newline = content.find('\n', delim_pos + 1)
+                    if close != -1 and (newline == -1 or close < newline):
+                        pos = close + 1
+    return TexRegions(comment_spans, math_spans, ignored_spans, exit_math, end_state)
+
+# --- Issue Records ---
+class SourceText:
+    """Per-file data shared by all issues of that file: the interned path and the
+    unstripped text of the hit lines, copied out when the issues are built. The file
+    text itself is not kept, so results stay small in memory and when pickled back
+    from pool workers."""
+    __slots__ = ("path", "lines")
+
+    def __init__(self, path, lines=None):
+        self.path = sys.intern(path)
+        self.lines = {} if lines is None else lines
+
+    def line_text(self, line_num):
+        """The unstripped text of line ``line_num``, which must hold a hit."""
+        return self.lines[line_num]
+
+    def context(self, line_num):
+        return self.lines[line_num].strip()
+
+    def __reduce__(self):
+        return (SourceText, (self.path, self.lines))
+
+ISSUE_FIELDS = ("file", "line", "col", "type", "context", "char_pos", "detected_char", "snippet")
+
+class TexIssue:
+    """One hit. Much smaller than the dict it replaces: the path and context live once
+    per file in ``source``, ``type`` is an interned string and the snippet is built on
+    first access. ``issue["line"]`` style access still works for older callers.
+    Hits of a :class:`RuleSet` rule carry the rule's shared :class:`RuleInfo` in ``rule``."""
+    __slots__ = ("source", "line", "col", "type", "char_pos", "detected_char", "rule", "_snippet")
+
+    def __init__(self, source, line, col, type, char_pos, detected_char, rule=None):
+        self.source = source
+        self.line = line
+        self.col = col
+        self.type = type
+        self.char_pos = char_pos
+        self.detected_char = detected_char
+        self.rule = rule
+        self._snippet = False
+
+    @property
+    def file(self):
+        return self.source.path
+
+    @property
+    def target(self):
+        """The ``issues_by_target`` key of this issue: the rule id or the target itself."""
+        return self.rule.id if self.rule is not None else self.detected_char
+
+    @property
+    def context(self):
+        return self.source.context(self.line)
+
+    @property
+    def snippet(self):
+        if self._snippet is False:
+            self._snippet = build_issue_snippet(self.source.line_text(self.line), self.col, self.detected_char)
+        return self._snippet
+
+    def __getitem__(self, key):
+        if key not in ISSUE_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in ISSUE_FIELDS else default
+
+    def to_dict(self):
+        issue_dict = {field: getattr(self, field) for field in ISSUE_FIELDS}
+        if self.rule is not None:
+            issue_dict["rule"], issue_dict["severity"], issue_dict["message"] = self.rule
+        return issue_dict
+
+    def __reduce__(self):
+        return (TexIssue, (self.source, self.line, self.col, self.type, self.char_pos, self.detected_char, self.rule))
+
+    def __repr__(self):
+        return f"TexIssue({self.file!r}, line={self.line}, col={self.col}, type={self.type!r}, detected_char={self.detected_char!r})"
 
 # --- Core Logic Function ---
+SEARCH_MODES = ("math_only", "text_only_strict", "document_wide")
+
+def normalize_targets(target_spec, default_search_mode):
+    """Return ``{target: search_mode}`` for a single target string, an iterable of
+    targets and/or ``(target, search_mode)`` pairs, or an existing mapping. For a
+    :class:`RuleSet` the keys are the rule ids."""
+    if isinstance(target_spec, RuleSet):
+        return {rule.id: rule.search_mode for rule in target_spec.rules}
+    if isinstance(target_spec, str):
+        return {target_spec: default_search_mode} if target_spec else {}
+    if isinstance(target_spec, dict):
+        items = target_spec.items()
+    else:
+        items = ((item, default_search_mode) if isinstance(item, str) else tuple(item) for item in target_spec)
+    return {target: (mode or default_search_mode) for target, mode in items if target}
+
+def parse_target_entry(entry_text):
+    """Split the GUI/CLI target text on whitespace, e.g. "，．、。" -> ["，．、。"] and
+    "， ． 、 。" -> ["，", "．", "、", "。"]. Text without whitespace stays one target."""
+    return entry_text.split() or ([entry_text] if entry_text else [])
+
+def resolve_ignored_commands(ignore_text_commands_flag):
+    """Return the command names skipped inside math for ``ignore_text_commands_flag``:
+    none when it is false, ``DEFAULT_IGNORED_TEXT_COMMANDS`` for ``True``, otherwise the
+    given names as an iterable or a comma/whitespace separated string ("text, \\mbox")."""
+    if not ignore_text_commands_flag:
+        return frozenset()
+    if ignore_text_commands_flag is True:
+        return DEFAULT_IGNORED_TEXT_COMMANDS
+    names = ignore_text_commands_flag
+    if isinstance(names, str):
+        names = names.replace(",", " ").split()
+    return frozenset(name.lstrip("\\") for name in names if name.lstrip("\\"))
+
+def compile_target_matchers(targets):
+    """Build the patterns that find every target in one pass per pattern.
+
+    Single characters go into one character class and are resolved through a
+    codepoint lookup table; longer strings keep their own literal pattern so that
+    overlapping targets are still reported independently.
+    """
+    single_chars = {target: mode for target, mode in targets.items() if len(target) == 1}
+    matchers = []
+    if single_chars:
+        char_class = "".join(re.escape(ch) for ch in sorted(single_chars))
+        matchers.append((re.compile(f"[{char_class}]"), single_chars))
+    for target, mode in targets.items():
+        if len(target) > 1:
+            matchers.append((re.compile(re.escape(target)), {target: mode}))
+    return matchers
+
+_MATH_ISSUE_TYPES = {}
+
+def classify_hit(regions, start, end, search_mode):
+    """Return the issue type for a hit at ``content[start:end]`` under ``search_mode``,
+    or None if the hit is outside the searched range."""
+    if search_mode == "math_only":
+        span = regions.math_piece_at(start)
+        if span is None or end > span.inner_end:
+            return None
+        issue_type = _MATH_ISSUE_TYPES.get(span.label)
+        if issue_type is None:
+            issue_type = _MATH_ISSUE_TYPES[span.label] = sys.intern(f"Math ({span.label})")
+        return issue_type
+    if search_mode == "text_only_strict":
+        if regions.text_blocked_at(start) or (end - start > 1 and regions.overlaps_math(start, end)):
+            return None
+        return "Text (Outside Math)"
+    if search_mode == "document_wide":
+        if regions.in_comment(start):
+            return None
+        return "Text (Document-wide)"
+    return None
+
 def find_target_char_in_tex(filepath, target_char_str, ignore_text_commands_flag, search_mode):
+    """Search ``filepath`` for one or more targets.
+
+    ``target_char_str`` is a single target string or a collection of targets (see
+    :func:`normalize_targets`); targets without their own mode use ``search_mode``.
+    The file is read and classified once however many targets are checked.
+    ``issues_list`` holds every issue ordered by position and ``issues_by_target``
+    groups them per target in the order the targets were given. A :class:`RuleSet`
+    may be given instead of targets.
+    """
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
             content = f.read()
     except Exception as e:
-        return {"error_message": f"Error reading file: {e}", "issues_list": [], "searched_char": target_char_str}
+        return {"error_message": f"Error reading file: {e}", "issues_list": [], "issues_by_target": {}, "searched_char": target_char_str}
+    return check_tex_content(filepath, content, target_char_str, ignore_text_commands_flag, search_mode)
 
-    if not target_char_str:
-        return {"error_message": "Target character is empty.", "issues_list": [], "searched_char": target_char_str}
+def check_tex_content(filepath, content, target_char_str, ignore_text_commands_flag, search_mode, regions=None, timings=None):
+    """Same as :func:`find_target_char_in_tex` for an already decoded ``content``.
+    ``regions`` may pass in a classification already made for ``content``. If a
+    ``timings`` dict is given, the seconds spent in each phase are added to it."""
+    if isinstance(target_char_str, RuleSet):
+        return check_tex_rules(filepath, content, target_char_str, ignore_text_commands_flag, regions, timings)
+    targets = normalize_targets(target_char_str, search_mode)
+    if not targets:
+        return {"error_message": "Target character is empty.", "issues_list": [], "issues_by_target": {}, "searched_char": target_char_str}
 
-    issues_found = []
-    escaped_target_char = re.escape(target_char_str)
-    target_pattern = re.compile(escaped_target_char)
-
-    env_pattern = re.compile(
-        r"\\begin\{(?P<env_name>(?:equation|align|gather|multline|eqnarray|displaymath|math|subequations)\*?)\}"
-        r"(?P<env_content>(?:.|\n)*?)"
-        r"\\end\{(?P=env_name)\}",
-        re.DOTALL
-    )
-    bracket_pattern = re.compile(r"\\\[(?P<bracket_content>(?:.|\n)*?)\\\]", re.DOTALL)
-    double_dollar_pattern = re.compile(r"(?<!\\)\$\$(?P<doubledollar_content>(?:.|\n)*?)(?<!\\)\$\$", re.DOTALL)
-    inline_pattern = re.compile(r"(?<![\$\\])\$(?P<inline_content>(?:[^$\\]|\\.)*?)(?<!\\)\$")
-    
-    math_env_regexes = [
-        {"pattern": env_pattern, "content_group": "env_content", "type_group": "env_name", "is_block": True},
-        {"pattern": bracket_pattern, "content_group": "bracket_content", "type_value": "display math \\[\\]", "is_block": True},
-        {"pattern": double_dollar_pattern, "content_group": "doubledollar_content", "type_value": "display math $$", "is_block": True},
-        {"pattern": inline_pattern, "content_group": "inline_content", "type_value": "inline math $", "is_block": False},
-    ]
+    if timings is not None:
+        phase_start = time.perf_counter()
+    if regions is None:
+        regions = classify_tex_regions(content, resolve_ignored_commands(ignore_text_commands_flag))
+        if timings is not None:
+            phase_start = add_phase_time(timings, "classify", phase_start)
 
-    if search_mode == "math_only":
-        for config in math_env_regexes:
-            pattern = config["pattern"]
-            for match in pattern.finditer(content):
-                math_content_inner = match.group(config["content_group"])
-                math_content_inner_start_offset = match.start(config["content_group"])
-                env_type_str = config.get("type_value")
-                if "type_group" in config: env_type_str = match.group(config["type_group"])
-
-                for char_match in target_pattern.finditer(math_content_inner):
-                    target_relative_pos_in_inner = char_match.start()
-                    target_absolute_pos = math_content_inner_start_offset + target_relative_pos_in_inner
-                    if is_in_comment_on_line(content, target_absolute_pos, match.start()):
-                        continue
-                    # ignore_text_commands_flag handling (not fully implemented)
-                    if ignore_text_commands_flag:
-                        pass 
-
-                    line_num, col_num = get_line_col_from_pos(content, target_absolute_pos)
-                    context_line_text = get_context_line_from_pos(content, target_absolute_pos)
-                    issues_found.append({
-                        "file": filepath, "line": line_num, "col": col_num,
-                        "type": f"Math ({env_type_str})", "context": context_line_text.strip(),
-                        "char_pos": target_absolute_pos, "detected_char": char_match.group(0)
-                    })
-
-    elif search_mode == "document_wide":
-        for char_match in target_pattern.finditer(content):
+    hits = []
+    for pattern, mode_by_target in compile_target_matchers(targets):
+        for char_match in pattern.finditer(content):
             target_absolute_pos = char_match.start()
-            if is_in_comment_on_line(content, target_absolute_pos):
-                 continue
-            line_num, col_num = get_line_col_from_pos(content, target_absolute_pos)
-            context_line_text = get_context_line_from_pos(content, target_absolute_pos)
-            issues_found.append({
-                "file": filepath, "line": line_num, "col": col_num,
-                "type": "Text (Document-wide)",
-                "context": context_line_text.strip(),
-                "char_pos": target_absolute_pos, "detected_char": char_match.group(0)
-            })
-    
-    elif search_mode == "text_only_strict":
-        math_spans = []
-        for config in math_env_regexes:
-            for match in config["pattern"].finditer(content):
-                math_spans.append((match.start(), match.end()))
-        math_spans.sort() 
-        
-        for char_match in target_pattern.finditer(content):
-            target_absolute_pos = char_match.start()
-            target_end_pos = char_match.end()
+            detected = char_match.group(0)
+            issue_type = classify_hit(regions, target_absolute_pos, char_match.end(), mode_by_target[detected])
+            if issue_type is not None:
+                hits.append((target_absolute_pos, detected, issue_type))
+    hits.sort()
+    if timings is not None:
+        phase_start = add_phase_time(timings, "match", phase_start)
 
-            if is_in_comment_on_line(content, target_absolute_pos):
-                 continue
+    # Line/column lookups are only set up for files that have hits.
+    issues_found = []
+    issues_by_target = {target: [] for target in targets}
+    if hits:
+        line_index = LineIndex(content)
+        source = SourceText(filepath)
+        lines = source.lines
+        for target_absolute_pos, detected, issue_type in hits:
+            line_num, col_num = line_index.line_col(target_absolute_pos)
+            if line_num not in lines:
+                lines[line_num] = line_index.line_text(line_num)
+            issue = TexIssue(source, line_num, col_num, issue_type, target_absolute_pos, detected)
+            issues_found.append(issue)
+            issues_by_target[detected].append(issue)
+    if timings is not None:
+        add_phase_time(timings, "resolve", phase_start)
+    return {"error_message": None, "issues_list": issues_found, "issues_by_target": issues_by_target, "searched_char": target_char_str}
 
-            in_math = False
-            for start, end in math_spans:
-                if max(target_absolute_pos, start) < min(target_end_pos, end):
-                    in_math = True
-                    break
-            
-            if not in_math:
-                line_num, col_num = get_line_col_from_pos(content, target_absolute_pos)
-                context_line_text = get_context_line_from_pos(content, target_absolute_pos)
-                issues_found.append({
-                    "file": filepath, "line": line_num, "col": col_num,
-                    "type": "Text (Outside Math)",
-                    "context": context_line_text.strip(),
-                    "char_pos": target_absolute_pos, "detected_char": char_match.group(0)
-                })
-
-    unique_issues = []
-    seen_positions = set()
-    issues_found.sort(key=lambda x: (x['char_pos'], x.get('detected_char','')))
-    for issue in issues_found:
-        issue_key = (issue['char_pos'], issue.get('detected_char',''))
-        if issue_key not in seen_positions:
-            unique_issues.append(issue)
-            seen_positions.add(issue_key)
-            
-    return {"error_message": None, "issues_list": unique_issues, "searched_char": target_char_str}
+# --- Rule Engine ---
+RULE_TYPES = ("literal", "char_class", "regex", "consistency")
+RULE_SEVERITIES = ("error", "warning", "info")
+# Scopes as written in rule files, and the search modes they stand for.
+RULE_SCOPES = {"math": "math_only", "text": "text_only_strict", "all": "document_wide"}
+RULE_KEYS = frozenset(("id", "type", "pattern", "variants", "prefer", "scope", "severity", "message", "ignore_case"))
+# A backslash (not itself escaped) before 1-9: group numbers change once rules are combined.
+_NUMBERED_BACKREF_RE = re.compile(r"(?<!\\)(?:\\\\)*\\[1-9]")
+
+RuleInfo = namedtuple("RuleInfo", ["id", "severity", "message"])
+
+def _regex_class_end(pattern, start):
+    """Index of the "]" closing the character class opened at ``pattern[start]``, or
+    ``len(pattern)`` if it is not closed."""
+    # A "]" right after "[" or "[^" is a member, not the end.
+    end = start + (2 if pattern.startswith("[^", start) else 1)
+    if pattern[end:end + 1] == "]":
+        end += 1
+    while end < len(pattern) and pattern[end] != "]":
+        end += 2 if pattern[end] == "\\" else 1
+    return min(end, len(pattern))
+
+def regex_start(pattern):
+    """Return ``(start_chars, start_class)`` for a regex whose matches obviously all
+    start with one literal character (``start_chars``) or one character class
+    (``start_class``, its source), judged from the source text alone; ``(None, None)``
+    if that is not obvious (e.g. a leading group or lookbehind, or a top-level ``|``)."""
+    start_chars = start_class = None
+    if pattern[0] == "[":
+        end = _regex_class_end(pattern, 0)
+        if end == len(pattern):
+            return None, None
+        start_class, rest = pattern[:end + 1], pattern[end + 1:]
+    elif pattern[0] == "\\":
+        if len(pattern) < 2 or pattern[1].isalnum():
+            return None, None
+        start_chars, rest = frozenset(pattern[1]), pattern[2:]
+    elif pattern[0] in ".^$*+?{}]|()":
+        return None, None
+    else:
+        start_chars, rest = frozenset(pattern[0]), pattern[1:]
+    if rest[:1] in ("?", "*", "{"):
+        return None, None
+    # A top-level alternative could start with anything.
+    depth = 0
+    i = 0
+    while i < len(rest):
+        ch = rest[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "[":
+            i = _regex_class_end(rest, i)
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            return None, None
+        i += 1
+    return start_chars, start_class
+
+class TexRule:
+    """One rule of a :class:`RuleSet`.
+
+    ``source`` is the regex the rule adds to the combined pattern and ``pattern`` the
+    same regex compiled alone. Consistency rules match any of their ``variants``;
+    per file, only the variants other than the preferred one (``prefer``, else the
+    most frequent) are reported. ``info`` is shared by the rule's issues; rules made
+    from plain targets have none, so their issues look like those of a target check.
+    """
+    __slots__ = ("id", "type", "source", "pattern", "search_mode", "severity", "message",
+                 "variants", "prefer", "ignore_case", "start_chars", "start_class", "definition", "info")
+
+    def __init__(self, id, type, source, search_mode, severity="warning", message=None, variants=(), prefer=None,
+                 ignore_case=False, start_chars=None, start_class=None, definition=None, reported=True):
+        self.id = id
+        self.type = type
+        self.source = source
+        self.pattern = re.compile(source)
+        self.search_mode = search_mode
+        self.severity = severity
+        self.message = message
+        self.variants = tuple(variants)
+        self.prefer = prefer
+        self.ignore_case = ignore_case
+        # What every match starts with, when known (see regex_start); such rules are
+        # only tried where the text starts that way.
+        self.start_chars = start_chars
+        self.start_class = start_class
+        self.definition = definition
+        self.info = RuleInfo(id, severity, message) if reported else None
+
+    @classmethod
+    def from_target(cls, target, search_mode):
+        return cls(target, "literal", re.escape(target), search_mode, start_chars=frozenset(target[0]),
+                   definition={"type": "literal", "pattern": target, "scope": search_mode}, reported=False)
+
+    @classmethod
+    def from_dict(cls, entry, index):
+        """Build a rule from one rule file entry, raising ValueError if it is invalid."""
+        if not isinstance(entry, dict):
+            raise ValueError(f"rule {index + 1}: expected an object, got {type(entry).__name__}")
+        rule_id = str(entry.get("id") or f"rule-{index + 1}")
+
+        def invalid(message):
+            return ValueError(f"rule '{rule_id}': {message}")
+
+        unknown = set(entry) - RULE_KEYS
+        if unknown:
+            raise invalid(f"unknown key(s) {', '.join(sorted(unknown))}")
+        rule_type = entry.get("type", "literal")
+        if rule_type not in RULE_TYPES:
+            raise invalid(f"type must be one of {', '.join(RULE_TYPES)}")
+        scope = entry.get("scope", "all")
+        search_mode = RULE_SCOPES.get(scope, scope)
+        if search_mode not in SEARCH_MODES:
+            raise invalid(f"scope must be one of {', '.join(RULE_SCOPES)}")
+        severity = entry.get("severity", "warning")
+        if severity not in RULE_SEVERITIES:
+            raise invalid(f"severity must be one of {', '.join(RULE_SEVERITIES)}")
+        message = entry.get("message")
+        if message is not None and not isinstance(message, str):
+            raise invalid("message must be a string")
+        ignore_case = bool(entry.get("ignore_case", False))
+
+        variants = ()
+        prefer = None
+        start_chars = start_class = None
+        if rule_type == "consistency":
+            variants = entry.get("variants")
+            if not isinstance(variants, list) or len(variants) < 2 or not all(isinstance(v, str) and v for v in variants):
+                raise invalid("variants must list at least two non-empty strings")
+            prefer = entry.get("prefer")
+            if prefer is not None and prefer not in variants:
+                raise invalid("prefer must be one of the variants")
+            # Longest first, so a variant that extends another one wins.
+            source = "|".join(re.escape(variant) for variant in sorted(variants, key=len, reverse=True))
+            start_chars = frozenset(variant[0] for variant in variants)
+        else:
+            pattern = entry.get("pattern")
+            if not isinstance(pattern, str) or not pattern:
+                raise invalid("pattern must be a non-empty string")
+            if rule_type == "literal":
+                source = re.escape(pattern)
+                start_chars = frozenset(pattern[0])
+            elif rule_type == "char_class":
+                source = start_class = f"[{pattern}]"
+            else:
+                if _NUMBERED_BACKREF_RE.search(pattern):
+                    raise invalid("numbered backreferences are not supported, use (?P<name>...) and (?P=name)")
+                source = f"(?:{pattern})"
+                start_chars, start_class = regex_start(pattern)
+        if ignore_case:
+            source = f"(?i:{source})"
+            start_chars = start_class = None
+        try:
+            matches_empty = re.compile(source).fullmatch("") is not None
+        except re.error as e:
+            raise invalid(f"invalid pattern: {e}") from None
+        if matches_empty:
+            raise invalid("pattern matches the empty string")
+        return cls(rule_id, rule_type, source, search_mode, severity, message, variants, prefer, ignore_case,
+                   start_chars, start_class, definition=entry)
+
+    def variant_of(self, text):
+        """The variant a consistency rule hit ``text`` stands for."""
+        if not self.ignore_case:
+            return text
+        folded = text.casefold()
+        return next(variant for variant in self.variants if variant.casefold() == folded)
+
+class RuleSet:
+    """Rules checked together in a single pass over each file.
+
+    The rules' regexes are combined into one alternation of named groups inside a
+    lookahead, so the text is scanned once however many rules there are, and the
+    hits of different rules may overlap. Rules whose matches start with a known
+    character or class sit behind a single character class test, so adding them
+    costs next to nothing; the others (e.g. a leading lookbehind) are tried at
+    every position. At a position matched by one rule, the rules after it in the
+    pattern are tried on their own. A RuleSet can be passed wherever a target spec
+    is accepted; ``issues_by_target`` is then keyed by rule id.
+    """
+    def __init__(self, rules):
+        self.rules = list(rules)
+        if not self.rules:
+            raise ValueError("the rule set is empty")
+        seen = set()
+        for rule in self.rules:
+            if rule.id in seen:
+                raise ValueError(f"duplicate rule id '{rule.id}'")
+            seen.add(rule.id)
+        guarded = [i for i, rule in enumerate(self.rules) if rule.start_chars is not None or rule.start_class is not None]
+        unguarded = [i for i, rule in enumerate(self.rules) if rule.start_chars is None and rule.start_class is None]
+        self.scan_order = guarded + unguarded
+        branches = []
+        if guarded:
+            chars = sorted(set().union(*(self.rules[i].start_chars or () for i in guarded)))
+            starts = ["[" + "".join(re.escape(ch) for ch in chars) + "]"] if chars else []
+            starts.extend(self.rules[i].start_class for i in guarded if self.rules[i].start_class is not None)
+            branches.append("(?=" + "|".join(starts) + ")" + self._lookahead(guarded))
+        if unguarded:
+            branches.append(self._lookahead(unguarded))
+        try:
+            self.combined = re.compile("|".join(branches))
+        except re.error as e:
+            raise ValueError(f"the rules cannot be combined: {e}") from None
+        self.rule_index_by_group = {self.combined.groupindex[f"_r{i}"]: i for i in range(len(self.rules))}
+        self.has_consistency = any(rule.variants for rule in self.rules)
+        self._followers = {}
+
+    def _lookahead(self, indices):
+        return "(?=" + "|".join(f"(?P<_r{i}>{self.rules[i].source})" for i in indices) + ")"
+
+    @classmethod
+    def from_targets(cls, target_spec, default_search_mode):
+        return cls(TexRule.from_target(target, mode) for target, mode in normalize_targets(target_spec, default_search_mode).items())
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a rule set from a parsed rule file: a list of rules or ``{"rules": [...]}``."""
+        entries = config.get("rules") if isinstance(config, dict) else config
+        if not isinstance(entries, list):
+            raise ValueError('expected a list of rules or {"rules": [...]}')
+        return cls(TexRule.from_dict(entry, index) for index, entry in enumerate(entries))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls.from_config(json.load(f))
+
+    def __add__(self, other):
+        return RuleSet(self.rules + other.rules)
+
+    def definitions(self):
+        return [rule.definition for rule in self.rules]
+
+    def followers(self, first, char):
+        """Indices of the rules after ``first`` in the pattern that may also match at a
+        position starting with ``char``."""
+        key = (first, char)
+        indices = self._followers.get(key)
+        if indices is None:
+            after = self.scan_order[self.scan_order.index(first) + 1:]
+            indices = self._followers[key] = tuple(
+                index for index in after
+                if self.rules[index].start_chars is None or char in self.rules[index].start_chars
+            )
+        return indices
+
+    def decide_consistency(self, found):
+        """``found`` maps consistency rule indices to the in-scope texts they matched in one
+        file. Returns ``{index: (preferred variant, RuleInfo for the other variants)}``."""
+        outcome = {}
+        for index, texts in found.items():
+            rule = self.rules[index]
+            counts = dict.fromkeys(rule.variants, 0)
+            for text in texts:
+                counts[rule.variant_of(text)] += 1
+            preferred = rule.prefer or max(rule.variants, key=counts.get)
+            message = rule.message or f"'{preferred}' is used {counts[preferred]} time(s) in this file"
+            outcome[index] = (preferred, RuleInfo(rule.id, rule.severity, message))
+        return outcome
+
+    def resolve_consistency(self, candidates):
+        """Return the issues to report among ``candidates``, the ``(rule index, issue)``
+        pairs left by :func:`check_tex_rules` with ``defer_consistency``."""
+        found = {}
+        for index, issue in candidates:
+            found.setdefault(index, []).append(issue.detected_char)
+        outcome = self.decide_consistency(found)
+        issues = []
+        for index, issue in candidates:
+            preferred, info = outcome[index]
+            if self.rules[index].variant_of(issue.detected_char) != preferred:
+                issue.rule = info
+                issues.append(issue)
+        return issues
+
+def check_tex_rules(filepath, content, rule_set, ignore_text_commands_flag, regions=None, timings=None, defer_consistency=False):
+    """:func:`check_tex_content` for a :class:`RuleSet`.
+
+    With ``defer_consistency`` the hits of consistency rules are not decided (that
+    needs the whole file) but returned as ``consistency_candidates`` for
+    :meth:`RuleSet.resolve_consistency`.
+    """
+    if timings is not None:
+        phase_start = time.perf_counter()
+    if regions is None:
+        regions = classify_tex_regions(content, resolve_ignored_commands(ignore_text_commands_flag))
+        if timings is not None:
+            phase_start = add_phase_time(timings, "classify", phase_start)
+
+    rules = rule_set.rules
+    rule_index_by_group = rule_set.rule_index_by_group
+    # Hits of one rule do not overlap each other, as with finditer on the rule alone.
+    next_start = [0] * len(rules)
+    hits = []
+    for match in rule_set.combined.finditer(content):
+        start = match.start()
+        first = rule_index_by_group[match.lastindex]
+        end = match.end(match.lastindex)
+        if start >= next_start[first]:
+            next_start[first] = end
+            issue_type = classify_hit(regions, start, end, rules[first].search_mode)
+            if issue_type is not None and end > start:
+                hits.append((start, content[start:end], first, issue_type))
+        for index in rule_set.followers(first, content[start]):
+            other = rules[index].pattern.match(content, start)
+            if other is None or start < next_start[index]:
+                continue
+            end = other.end()
+            next_start[index] = end
+            issue_type = classify_hit(regions, start, end, rules[index].search_mode)
+            if issue_type is not None and end > start:
+                hits.append((start, content[start:end], index, issue_type))
+    hits.sort()
+
+    infos = [rule.info for rule in rules]
+    if rule_set.has_consistency and not defer_consistency:
+        found = {}
+        for _, detected, index, _ in hits:
+            if rules[index].variants:
+                found.setdefault(index, []).append(detected)
+        if found:
+            outcome = rule_set.decide_consistency(found)
+            for index, (_, info) in outcome.items():
+                infos[index] = info
+            hits = [hit for hit in hits if hit[2] not in outcome or rules[hit[2]].variant_of(hit[1]) != outcome[hit[2]][0]]
+    if timings is not None:
+        phase_start = add_phase_time(timings, "match", phase_start)
+
+    issues_found = []
+    issues_by_target = {rule.id: [] for rule in rules}
+    candidates = []
+    if hits:
+        line_index = LineIndex(content)
+        source = SourceText(filepath)
+        lines = source.lines
+        for start, detected, index, issue_type in hits:
+            line_num, col_num = line_index.line_col(start)
+            if line_num not in lines:
+                lines[line_num] = line_index.line_text(line_num)
+            issue = TexIssue(source, line_num, col_num, issue_type, start, detected, infos[index])
+            if defer_consistency and rules[index].variants:
+                candidates.append((index, issue))
+                continue
+            issues_found.append(issue)
+            issues_by_target[rules[index].id].append(issue)
+    if timings is not None:
+        add_phase_time(timings, "resolve", phase_start)
+    result = {"error_message": None, "issues_list": issues_found, "issues_by_target": issues_by_target, "searched_char": rule_set}
+    if defer_consistency:
+        result["consistency_candidates"] = candidates
+    return result
+
+# --- File Discovery ---
+# Names (glob patterns) of folders that are never searched for .tex files by default.
+DEFAULT_EXCLUDES = (".git", ".hg", ".svn", "node_modules", "build", "_build", "texmf", "texmf-dist", "texmf-local", "__pycache__", ".venv")
+# Threads listing directories ahead of the walk; listing is I/O bound (network mounts).
+DISCOVERY_WORKERS = 8
+
+def compile_exclude_patterns(patterns):
+    """Return a matcher for file/folder names against glob ``patterns``, or None if empty."""
+    patterns = [pattern for pattern in patterns if pattern]
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns)).match
+
+def parse_exclude_entry(entry_text):
+    """Split the GUI/CLI exclude text ("build, out  *.bak") into patterns."""
+    return entry_text.replace(",", " ").split()
+
+class GitIgnore:
+    """The patterns of one ``.gitignore``, matched against paths relative to its folder.
+
+    Supports comments, ``!`` negation, trailing ``/`` for folders only, anchoring by a
+    ``/`` inside the pattern, ``*``, ``?``, ``[...]`` and ``**``.
+    """
+    def __init__(self, base_dir, lines):
+        self.base_dir = base_dir
+        self.rules = []
+        for line in lines:
+            rule = self.compile_rule(line)
+            if rule is not None:
+                self.rules.append(rule)
+
+    @classmethod
+    def load(cls, base_dir):
+        try:
+            with open(os.path.join(base_dir, ".gitignore"), 'r', encoding='utf-8', errors='replace') as f:
+                return cls(base_dir, f.read().splitlines())
+        except OSError:
+            return None
+
+    @staticmethod
+    def compile_rule(line):
+        line = line.rstrip("\n")
+        if not line.endswith("\\ "):
+            line = line.rstrip(" ")
+        if not line or line.startswith("#"):
+            return None
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        elif line.startswith(("\\#", "\\!")):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            return None
+        anchored = "/" in line
+        line = line.lstrip("/")
+        parts = []
+        i = 0
+        while i < len(line):
+            ch = line[i]
+            if line.startswith("**/", i):
+                parts.append("(?:.*/)?")
+                i += 3
+                continue
+            if line.startswith("**", i):
+                parts.append(".*")
+                i += 2
+                continue
+            if ch == "*":
+                parts.append("[^/]*")
+            elif ch == "?":
+                parts.append("[^/]")
+            elif ch == "[":
+                close = line.find("]", i + 2)
+                if close == -1:
+                    parts.append(re.escape(ch))
+                else:
+                    body = line[i + 1:close]
+                    if body.startswith("!"):
+                        body = "^" + body[1:]
+                    parts.append("[" + body.replace("\\", "\\\\") + "]")
+                    i = close
+            elif ch == "\\" and i + 1 < len(line):
+                i += 1
+                parts.append(re.escape(line[i]))
+            else:
+                parts.append(re.escape(ch))
+            i += 1
+        prefix = "" if anchored else "(?:.*/)?"
+        return re.compile(prefix + "".join(parts) + r"\Z", re.DOTALL), negate, dir_only
+
+    def match(self, path, is_dir):
+        """True if ignored, False if re-included by a ``!`` rule, None if no rule applies."""
+        relative = os.path.relpath(path, self.base_dir).replace(os.sep, "/")
+        result = None
+        for pattern, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if pattern.match(relative):
+                result = not negate
+        return result
+
+def is_git_ignored(gitignores, path, is_dir):
+    """Apply ``gitignores`` (outermost folder first); deeper and later rules win."""
+    ignored = False
+    for gitignore in gitignores:
+        matched = gitignore.match(path, is_dir)
+        if matched is not None:
+            ignored = matched
+    return ignored
+
+def enclosing_gitignores(folder):
+    """``.gitignore`` files of the folders above ``folder`` up to its repository root."""
+    gitignores = []
+    current = os.path.abspath(folder)
+    while True:
+        if os.path.exists(os.path.join(current, ".git")):
+            break
+        parent = os.path.dirname(current)
+        if parent == current:
+            return []  # not inside a repository: only the folder's own rules apply
+        current = parent
+        gitignore = GitIgnore.load(current)
+        if gitignore is not None:
+            gitignores.append(gitignore)
+    gitignores.reverse()
+    return gitignores
+
+def _list_directory(path, read_gitignore):
+    # Discovery worker: (subfolder names, file names, GitIgnore or None) like one os.walk step.
+    dirnames = []
+    filenames = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir() and not entry.is_symlink()
+                except OSError:
+                    is_dir = False
+                (dirnames if is_dir else filenames).append(entry.name)
+    except OSError:
+        return [], [], None
+    gitignore = GitIgnore.load(path) if read_gitignore and ".gitignore" in filenames else None
+    return dirnames, filenames, gitignore
+
+def iter_tex_files(folder, excludes=DEFAULT_EXCLUDES, use_gitignore=True, max_workers=DISCOVERY_WORKERS):
+    """Yield the .tex files under ``folder`` in ``os.walk`` order as they are found.
+
+    Folders and files whose name matches one of the ``excludes`` glob patterns are
+    skipped, and with ``use_gitignore`` so is everything ``.gitignore`` files (in the
+    folder tree and above it up to the repository root) ignore. Subfolder listings
+    are fetched ahead on a thread pool, which hides the latency of slow file systems.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    is_excluded = compile_exclude_patterns(excludes)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        outer = tuple(enclosing_gitignores(folder)) if use_gitignore else ()
+        stack = [(folder, outer, executor.submit(_list_directory, folder, use_gitignore))]
+        while stack:
+            dirpath, gitignores, listing = stack.pop()
+            dirnames, filenames, gitignore = listing.result()
+            if gitignore is not None:
+                gitignores += (gitignore,)
+            for filename in filenames:
+                if not filename.lower().endswith(".tex") or (is_excluded and is_excluded(filename)):
+                    continue
+                filepath = os.path.join(dirpath, filename)
+                if gitignores and is_git_ignored(gitignores, filepath, False):
+                    continue
+                yield filepath
+            subdirs = []
+            for dirname in dirnames:
+                if is_excluded and is_excluded(dirname):
+                    continue
+                subdir = os.path.join(dirpath, dirname)
+                if gitignores and is_git_ignored(gitignores, subdir, True):
+                    continue
+                subdirs.append((subdir, gitignores, executor.submit(_list_directory, subdir, use_gitignore)))
+            stack.extend(reversed(subdirs))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def find_tex_files(folder, excludes=DEFAULT_EXCLUDES, use_gitignore=True):
+    return list(iter_tex_files(folder, excludes, use_gitignore))
+
+def make_tex_path_filter(folder, excludes=DEFAULT_EXCLUDES, use_gitignore=True):
+    """Return ``accept(path, is_dir=False)``, which applies the rules of
+    :func:`iter_tex_files` to a single path under ``folder`` (for watch events).
+    ``.gitignore`` files are read once per folder."""
+    is_excluded = compile_exclude_patterns(excludes)
+    folder = os.path.normpath(folder)
+    chains = {}
+
+    def gitignores_in(dirpath):
+        # The .gitignore files that apply to entries of dirpath, outermost first.
+        chain = chains.get(dirpath)
+        if chain is None:
+            chain = tuple(enclosing_gitignores(folder)) if dirpath == folder else gitignores_in(os.path.dirname(dirpath))
+            gitignore = GitIgnore.load(dirpath)
+            if gitignore is not None:
+                chain += (gitignore,)
+            chains[dirpath] = chain
+        return chain
+
+    def accept(path, is_dir=False):
+        relative = os.path.relpath(os.path.normpath(path), folder)
+        if relative == os.curdir or relative.startswith(os.pardir):
+            return relative == os.curdir
+        parts = relative.split(os.sep)
+        if is_excluded and any(is_excluded(part) for part in parts):
+            return False
+        if use_gitignore:
+            dirpath = folder
+            for i, part in enumerate(parts):
+                entry = os.path.join(dirpath, part)
+                if is_git_ignored(gitignores_in(dirpath), entry, is_dir or i < len(parts) - 1):
+                    return False
+                dirpath = entry
+        return True
+    return accept
+
+# --- File Reading ---
+def decode_tex_bytes(data):
+    """Decode raw file bytes the way ``open(..., 'r', encoding='utf-8')`` would, newlines included."""
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+def read_tex_file(filepath, with_fingerprint=False):
+    """Return ``(content, fingerprint)``; ``fingerprint`` is ``(mtime_ns, size, content_hash)``
+    when requested, else None."""
+    st = os.stat(filepath)
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    fingerprint = (st.st_mtime_ns, st.st_size, hash_tex_bytes(data)) if with_fingerprint else None
+    return decode_tex_bytes(data), fingerprint
+
+def hash_tex_bytes(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def hash_tex_file(filepath):
+    """:func:`hash_tex_bytes` of a file's content, read in ``STREAM_CHUNK_SIZE`` chunks."""
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(filepath, 'rb') as f:
+        for data in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+def check_tex_file(filepath, target_spec, ignore_text_commands_flag, search_mode, with_fingerprint=False, profile=False):
+    """Pool task: read and check one file, returning ``(result_dict, fingerprint)``.
+    Files of ``STREAM_MIN_FILE_SIZE`` or more are checked in chunks. With ``profile``
+    the result gets a ``profile`` record (see :class:`ScanProfile`)."""
+    timings = {} if profile else None
+    if profile:
+        start = time.perf_counter()
+    size = 0
+    content = None
+    try:
+        size = os.path.getsize(filepath)
+        if size >= STREAM_MIN_FILE_SIZE:
+            result_dict, fingerprint = check_large_tex_file(filepath, target_spec, ignore_text_commands_flag, search_mode, with_fingerprint, timings)
+        else:
+            content, fingerprint = read_tex_file(filepath, with_fingerprint)
+    except Exception as e:
+        result_dict, fingerprint = {"error_message": f"Error reading file: {e}", "issues_list": [], "issues_by_target": {}, "searched_char": target_spec}, None
+    if content is not None:
+        if profile:
+            add_phase_time(timings, "read", start)
+        result_dict = check_tex_content(filepath, content, target_spec, ignore_text_commands_flag, search_mode, timings=timings)
+    if profile:
+        result_dict["profile"] = {"bytes": size, "seconds": time.perf_counter() - start, "phases": timings}
+    return result_dict, fingerprint
+
+# --- Streaming Check ---
+# check_tex_file streams files this large instead of reading them whole.
+STREAM_MIN_FILE_SIZE = 32 * 1024 * 1024
+STREAM_CHUNK_SIZE = 4 * 1024 * 1024
+
+def iter_tex_issues(filepath, target_char_str, ignore_text_commands_flag, search_mode, chunk_size=STREAM_CHUNK_SIZE, hasher=None, timings=None):
+    """Yield the issues of ``filepath`` in position order while reading it in
+    line-aligned chunks of about ``chunk_size`` bytes, so memory stays bounded by the
+    chunk size (plus the longest line) however large the file is.
+
+    The file is memory-mapped; each chunk is decoded on its own (chunks end after a
+    newline, so no UTF-8 sequence or CRLF pair is split) and classified with the
+    scanner state left by the previous chunk. Whether a math opener is ever closed is
+    answered for the rest of the file by a backwards search of the mapping. Issues
+    carry their context line instead of a reference to the chunk text. A multi-character
+    target that spans a line break across two chunks is not found. ``hasher``, if
+    given, is fed every byte of the file; ``timings`` is as for :func:`check_tex_content`.
+    The issues of :class:`RuleSet` consistency rules need the whole file, so they
+    come last.
+    """
+    rule_set = target_char_str if isinstance(target_char_str, RuleSet) else None
+    targets = normalize_targets(target_char_str, search_mode)
+    if not targets:
+        raise ValueError("Target character is empty.")
+    candidates = []
+    ignored_commands = resolve_ignored_commands(ignore_text_commands_flag)
+    with open(filepath, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            last_closer_pos = {}
+            end = 0
+
+            def closer_after_end(closer):
+                # Closers hold no newline, so one starting before the chunk end lies in the chunk.
+                pos = last_closer_pos.get(closer)
+                if pos is None:
+                    encoded = closer.encode('utf-8')
+                    pos = mm.rfind(encoded)
+                    while pos > 0 and is_escaped(mm, pos, b'\\'):
+                        pos = mm.rfind(encoded, 0, pos)
+                    last_closer_pos[closer] = pos
+                return pos >= end
+
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            state = None
+            char_base = 0
+            line_base = 0
+            start = 0
+            while start < size:
+                if timings is not None:
+                    phase_start = time.perf_counter()
+                end = start + chunk_size
+                if end >= size:
+                    end = size
+                else:
+                    newline = mm.find(b'\n', end - 1)
+                    end = size if newline == -1 else newline + 1
+                data = mm[start:end]
+                if hasher is not None:
+                    hasher.update(data)
+                text = decoder.decode(data, final=end == size).replace('\r\n', '\n').replace('\r', '\n')
+                del data
+                if timings is not None:
+                    phase_start = add_phase_time(timings, "read", phase_start)
+                regions = classify_tex_regions(text, ignored_commands, resume_state=state, closer_after_end=closer_after_end)
+                state = regions.resume_state
+                if timings is not None:
+                    add_phase_time(timings, "classify", phase_start)
+                if rule_set is not None:
+                    result = check_tex_rules(filepath, text, rule_set, ignore_text_commands_flag, regions, timings,
+                                             defer_consistency=rule_set.has_consistency)
+                    issues = result["issues_list"]
+                    chunk_candidates = result.get("consistency_candidates", ())
+                    candidates.extend(chunk_candidates)
+                else:
+                    issues = check_tex_content(filepath, text, targets, ignore_text_commands_flag, search_mode, regions, timings)["issues_list"]
+                    chunk_candidates = ()
+                if issues or chunk_candidates:
+                    source = SourceText(filepath)
+                    for issue in itertools.chain(issues, (issue for _, issue in chunk_candidates)):
+                        line = issue.line + line_base
+                        if line not in source.lines:
+                            source.lines[line] = issue.source.line_text(issue.line)
+                        issue.source = source
+                        issue.line = line
+                        issue.char_pos += char_base
+                char_base += len(text)
+                line_base += text.count('\n')
+                start = end
+                del text, regions
+                yield from issues
+    if candidates:
+        yield from rule_set.resolve_consistency(candidates)
+
+def check_large_tex_file(filepath, target_spec, ignore_text_commands_flag, search_mode, with_fingerprint=False, timings=None):
+    """:func:`check_tex_file` for large files, built on :func:`iter_tex_issues`."""
+    targets = normalize_targets(target_spec, search_mode)
+    if not targets:
+        return {"error_message": "Target character is empty.", "issues_list": [], "issues_by_target": {}, "searched_char": target_spec}, None
+    st = os.stat(filepath)
+    hasher = hashlib.blake2b(digest_size=16) if with_fingerprint else None
+    spec = target_spec if isinstance(target_spec, RuleSet) else targets
+    issues_list = list(iter_tex_issues(filepath, spec, ignore_text_commands_flag, search_mode, hasher=hasher, timings=timings))
+    if isinstance(target_spec, RuleSet) and target_spec.has_consistency:
+        # Consistency issues came last; restore the order check_tex_rules gives.
+        rule_order = {rule.id: index for index, rule in enumerate(target_spec.rules)}
+        issues_list.sort(key=lambda x: (x.char_pos, x.detected_char, rule_order[x.target]))
+    issues_by_target = {target: [] for target in targets}
+    for issue in issues_list:
+        issues_by_target[issue.target].append(issue)
+    fingerprint = (st.st_mtime_ns, st.st_size, hasher.hexdigest()) if with_fingerprint else None
+    return {"error_message": None, "issues_list": issues_list, "issues_by_target": issues_by_target, "searched_char": target_spec}, fingerprint
+
+# --- Profiling ---
+PROFILE_PHASES = ("read", "classify", "match", "resolve")
+PROFILE_TOP_FILES = 10
+
+def add_phase_time(timings, phase, start):
+    """Add the seconds since ``start`` to ``timings[phase]`` and return the current time."""
+    now = time.perf_counter()
+    timings[phase] = timings.get(phase, 0.0) + now - start
+    return now
+
+class ScanProfile:
+    """Timings of one check run.
+
+    Each checked file contributes the ``profile`` record that :func:`check_tex_file`
+    attaches when called with ``profile=True``: ``bytes``, wall ``seconds`` and the
+    seconds per phase (read, classify = math/comment/verbatim scan, match = target
+    search and hit classification, resolve = line/column and issue records). Files
+    answered from the result cache carry no record and are only counted. Stages of
+    the caller, such as rendering, are added with :meth:`add_stage`.
+    """
+    def __init__(self):
+        self.files = []
+        self.cached_files = 0
+        self.stages = {}
+        self.started = time.perf_counter()
+        self.wall_seconds = None
+
+    def add_result(self, filepath, result_dict):
+        """Take the ``profile`` record out of ``result_dict`` (so results look the same
+        with and without profiling) and keep it."""
+        record = result_dict.pop("profile", None)
+        if record is None:
+            self.cached_files += 1
+            return
+        record["hits"] = len(result_dict["issues_list"])
+        self.files.append((filepath, record))
+
+    def add_stage(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self.started
+
+    def slowest(self, count=PROFILE_TOP_FILES):
+        return heapq.nlargest(count, self.files, key=lambda item: item[1]["seconds"])
+
+    def phase_totals(self):
+        totals = dict.fromkeys(PROFILE_PHASES, 0.0)
+        for _, record in self.files:
+            for phase, seconds in record["phases"].items():
+                totals[phase] = totals.get(phase, 0.0) + seconds
+        return totals
+
+    def to_dict(self):
+        return {
+            "wall_seconds": self.wall_seconds,
+            "files_checked": len(self.files),
+            "files_cached": self.cached_files,
+            "bytes": sum(record["bytes"] for _, record in self.files),
+            "phases": self.phase_totals(),
+            "stages": dict(self.stages),
+            "files": [dict(record, file=filepath) for filepath, record in self.files],
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=1)
+
+    def format_table(self, count=PROFILE_TOP_FILES, relative_to=None):
+        """Return the totals and the ``count`` slowest files as lines of text."""
+        totals = self.phase_totals()
+        totals.update(self.stages)
+        total_bytes = sum(record["bytes"] for _, record in self.files)
+        wall = f"{self.wall_seconds:.2f}s" if self.wall_seconds is not None else "-"
+        lines = [
+            f"wall {wall}, {len(self.files)} files checked ({self.cached_files} cached), {total_bytes / 1024 / 1024:.1f} MB",
+            "total " + "  ".join(f"{phase} {seconds:.3f}s" for phase, seconds in totals.items()),
+            f"{'seconds':>8} {'MB':>7} {'hits':>7}  " + " ".join(f"{phase:>8}" for phase in PROFILE_PHASES) + "  file",
+        ]
+        for filepath, record in self.slowest(count):
+            phases = " ".join(f"{record['phases'].get(phase, 0.0):8.3f}" for phase in PROFILE_PHASES)
+            name = os.path.relpath(filepath, relative_to) if relative_to else filepath
+            lines.append(f"{record['seconds']:8.3f} {record['bytes'] / 1024 / 1024:7.2f} {record['hits']:7d}  {phases}  {name}")
+        return lines
+
+# --- Result Cache ---
+# Part of every cache key; bump it whenever a change alters what a check reports.
+CHECKER_VERSION = "9"
+CACHE_MAX_ENTRIES = 50000
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+def default_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") if os.name == "nt" else os.environ.get("XDG_CACHE_HOME")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "tex_char_checker")
+
+class ResultCache:
+    """SQLite store of per-file check results.
+
+    Entries are keyed by absolute path and a digest of the check parameters
+    (targets and their modes, ignored text commands, search mode, ``CHECKER_VERSION``).
+    A stored result is reused while the file's mtime and size are unchanged, or
+    when they changed but the content hash still matches. Least recently used
+    entries are evicted on :meth:`flush` once ``max_entries`` or ``max_bytes``
+    is exceeded. A connection must be used from the thread that opened it.
+    """
+    def __init__(self, path=None, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        if path is None:
+            path = os.path.join(default_cache_dir(), "results.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " path TEXT NOT NULL, params TEXT NOT NULL, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL,"
+            " content_hash TEXT NOT NULL, result BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (path, params))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.touched = []
+
+    @staticmethod
+    def params_key(target_spec, ignore_text_commands_flag, search_mode):
+        if isinstance(target_spec, RuleSet):
+            targets = target_spec.definitions()
+        else:
+            targets = sorted(normalize_targets(target_spec, search_mode).items())
+        raw = json.dumps([CHECKER_VERSION, marshal.version, targets,
+                          sorted(resolve_ignored_commands(ignore_text_commands_flag)), search_mode], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def lookup(self, filepath, params_key):
+        """Return the stored result for an unchanged file, else None."""
+        abs_path = os.path.abspath(filepath)
+        row = self.conn.execute(
+            "SELECT mtime_ns, size, content_hash, result FROM results WHERE path = ? AND params = ?",
+            (abs_path, params_key),
+        ).fetchone()
+        if row is None:
+            return None
+        mtime_ns, size, content_hash, blob = row
+        try:
+            st = os.stat(filepath)
+            if st.st_size != size:
+                return None
+            if st.st_mtime_ns != mtime_ns:
+                if hash_tex_file(filepath) != content_hash:
+                    return None
+                self.conn.execute("UPDATE results SET mtime_ns = ? WHERE path = ? AND params = ?", (st.st_mtime_ns, abs_path, params_key))
+        except OSError:
+            return None
+        self.touched.append((time.time(), abs_path, params_key))
+        return self.unpack_result(filepath, blob)
+
+    # Results are stored as marshalled rows rather than JSON: loading them back is
+    # what a warm recheck spends its time on.
+    @staticmethod
+    def pack_result(result_dict):
+        rows = [
+            (issue.line, issue.col, issue.type, issue.source.line_text(issue.line), issue.char_pos, issue.detected_char,
+             None if issue.rule is None else tuple(issue.rule))
+            for issue in result_dict["issues_list"]
+        ]
+        return zlib.compress(marshal.dumps((list(result_dict["issues_by_target"]), rows)), 1)
+
+    @staticmethod
+    def unpack_result(filepath, blob):
+        targets, rows = marshal.loads(zlib.decompress(blob))
+        source = SourceText(filepath)
+        issues_by_target = {target: [] for target in targets}
+        issues_list = []
+        rule_infos = {}
+        for line, col, issue_type, line_text, char_pos, detected_char, rule in rows:
+            source.lines.setdefault(line, line_text)
+            if rule is not None:
+                rule = rule_infos.get(rule) or rule_infos.setdefault(rule, RuleInfo(*rule))
+            issue = TexIssue(source, line, col, sys.intern(issue_type), char_pos, detected_char, rule)
+            issues_list.append(issue)
+            issues_by_target[issue.target].append(issue)
+        return {"error_message": None, "issues_list": issues_list, "issues_by_target": issues_by_target, "searched_char": None}
+
+    def store(self, filepath, params_key, fingerprint, result_dict):
+        if result_dict["error_message"] or fingerprint is None:
+            return
+        mtime_ns, size, content_hash = fingerprint
+        blob = self.pack_result(result_dict)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO results (path, params, mtime_ns, size, content_hash, result, last_used) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(filepath), params_key, mtime_ns, size, content_hash, blob, time.time()),
+        )
+
+    def flush(self):
+        if self.touched:
+            self.conn.executemany("UPDATE results SET last_used = ? WHERE path = ? AND params = ?", self.touched)
+            self.touched = []
+        self.evict()
+        self.conn.commit()
+
+    def evict(self):
+        count, total_bytes = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(result)), 0) FROM results").fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+        stale = []
+        for rowid, blob_len in self.conn.execute("SELECT rowid, LENGTH(result) FROM results ORDER BY last_used"):
+            if count <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            stale.append((rowid,))
+            count -= 1
+            total_bytes -= blob_len
+        self.conn.executemany("DELETE FROM results WHERE rowid = ?", stale)
+
+    def clear(self):
+        self.touched = []
+        self.conn.execute("DELETE FROM results")
+        self.conn.commit()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+# --- Parallel Checking ---
+# Below this many files the process pool start-up costs more than it saves.
+PARALLEL_MIN_FILES = 8
+SCAN_POLL_INTERVAL_MS = 50
+
+def iter_check_results(filepaths, target_spec, ignore_text_commands_flag, search_mode, max_workers=None, cancel_event=None, cache=None,
+                       profile=False):
+    """Check ``filepaths`` on a process pool and yield ``(index, filepath, result_dict)``
+    as each file finishes. ``index`` is the position in ``filepaths``.
+
+    ``filepaths`` may be a generator such as :func:`iter_tex_files`: files are checked
+    while it is still producing paths. With a :class:`ResultCache`, unchanged files
+    are answered from it and only the remaining files are checked (and stored).
+    Setting ``cancel_event`` stops the iteration and drops files not started yet.
+    With ``profile``, results of checked files carry a record for :class:`ScanProfile`.
+    """
+    params_key = None
+    if cache is not None:
+        params_key = cache.params_key(target_spec, ignore_text_commands_flag, search_mode)
+
+    def tasks():
+        for index, filepath in enumerate(filepaths):
+            result_dict = cache.lookup(filepath, params_key) if cache is not None else None
+            if result_dict is not None:
+                result_dict["searched_char"] = target_spec
+                yield index, filepath, (result_dict, None)
+            else:
+                yield index, filepath, None
+
+    task_args = (target_spec, ignore_text_commands_flag, search_mode, cache is not None, profile)
+    try:
+        for index, filepath, (result_dict, fingerprint) in _run_check_tasks(tasks(), task_args, max_workers, cancel_event):
+            if cache is not None:
+                cache.store(filepath, params_key, fingerprint, result_dict)
+            yield index, filepath, result_dict
+    finally:
+        if cache is not None:
+            cache.flush()
+
+def _run_check_tasks(tasks, task_args, max_workers, cancel_event):
+    # tasks yields (index, filepath, outcome); outcome is None for files still to check.
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    tasks = iter(tasks)
+
+    # Read ahead until there is enough work to be worth a pool.
+    to_check = []
+    if max_workers > 1:
+        for index, filepath, outcome in tasks:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            if outcome is not None:
+                yield index, filepath, outcome
+                continue
+            to_check.append((index, filepath))
+            if len(to_check) >= PARALLEL_MIN_FILES:
+                break
+    if len(to_check) < PARALLEL_MIN_FILES:
+        # Either tasks is used up or there is a single worker: check in this process.
+        for index, filepath, outcome in itertools.chain([(index, filepath, None) for index, filepath in to_check], tasks):
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            yield index, filepath, outcome if outcome is not None else check_tex_file(filepath, *task_args)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    futures = {}
+    done = queue.Queue()
+
+    def submit(index, filepath):
+        future = executor.submit(check_tex_file, filepath, *task_args)
+        futures[future] = (index, filepath)
+        future.add_done_callback(done.put)
+
+    def finished(future):
+        index, filepath = futures.pop(future)
+        try:
+            outcome = future.result()
+        except Exception as e:
+            outcome = ({"error_message": f"Error checking file: {e}", "issues_list": [], "issues_by_target": {}, "searched_char": task_args[0]}, None)
+        return index, filepath, outcome
+
+    completed = False
+    try:
+        for index, filepath in to_check:
+            submit(index, filepath)
+        # Keep submitting paths as they arrive, passing on whatever has finished meanwhile.
+        for index, filepath, outcome in tasks:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            if outcome is not None:
+                yield index, filepath, outcome
+            else:
+                submit(index, filepath)
+            while not done.empty():
+                yield finished(done.get())
+        while futures:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+            yield finished(done.get())
+        completed = True
+    finally:
+        # Only a cancelled or abandoned run leaves the workers behind; a finished one
+        # waits for them so that they are gone before the interpreter exits.
+        executor.shutdown(wait=completed, cancel_futures=not completed)
+
+# --- Project Mode ---
+# Only the start of a file is searched for \documentclass when looking for root documents.
+ROOT_DETECT_CHARS = 64 * 1024
+_DOCUMENTCLASS_RE = re.compile(r"^[^%\n]*\\documentclass\b", re.MULTILINE)
+
+def resolve_include_path(command, argument, including_file, root_file):
+    """Return the existing file an include command refers to, or None.
+
+    ``\\input``/``\\include`` are looked up relative to the root document's folder
+    (where TeX runs) and then the including file's folder; ``\\subfile`` relative to
+    the including file. ``.tex`` is added like TeX does.
+    """
+    name = argument.strip().strip('"')
+    if not name:
+        return None
+    if command in ("subfile", "subfileinclude"):
+        bases = [os.path.dirname(including_file)]
+    else:
+        bases = [os.path.dirname(root_file), os.path.dirname(including_file)]
+    if command == "include":
+        names = [name + ".tex"]
+    elif name.lower().endswith(".tex"):
+        names = [name]
+    else:
+        names = [name + ".tex", name]
+    for base in dict.fromkeys(bases):
+        for candidate in names:
+            path = os.path.normpath(os.path.join(base, candidate))
+            if os.path.isfile(path):
+                return path
+    return None
+
+def is_root_document(filepath):
+    """True if the file has an uncommented ``\\documentclass`` near its start."""
+    try:
+        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+            head = f.read(ROOT_DETECT_CHARS)
+    except OSError:
+        return False
+    return _DOCUMENTCLASS_RE.search(head) is not None
+
+class ProjectScan:
+    """One scan of a file in a project: the file's result for one entry math state,
+    plus what it depends on (its fingerprint and every include it followed)."""
+    __slots__ = ("path", "fingerprint", "entry_math", "exit_math", "includes", "missing", "sites", "result", "generation")
+
+    def __init__(self, path, fingerprint, entry_math, exit_math, includes, missing, sites, result, generation):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.entry_math = entry_math
+        self.exit_math = exit_math
+        self.includes = includes  # [(child, entry_math, exit_math)] in include order
+        self.missing = missing    # [(command, argument)] of includes that did not resolve
+        self.sites = sites        # [(child, line, col)] of the include commands
+        self.result = result
+        self.generation = generation
+
+class TexProject:
+    """Checks documents the way TeX reads them, following ``\\input``, ``\\include``
+    and ``\\subfile`` from the root documents.
+
+    An included file is classified in the math state of its include site, so math
+    that spans an include boundary is handled, and each physical file is scanned once
+    (once per distinct entry state, should it be included both in and outside math).
+    Scans and the include graph are kept between :meth:`check` calls: a later call
+    only rescans files whose mtime/size changed, or whose includes now resolve or
+    end in a different state, so an edit re-checks just the affected files.
+
+    Paths are normalized internally, but results are keyed by the paths as the
+    caller gave them (files reached only through includes by their normalized path).
+    """
+    def __init__(self, target_spec, ignore_text_commands_flag, search_mode):
+        self.target_spec = target_spec
+        self.ignore_text_commands_flag = ignore_text_commands_flag
+        self.search_mode = search_mode
+        self.ignored_commands = resolve_ignored_commands(ignore_text_commands_flag)
+        self.files = []
+        self._given_paths = {}
+        self._scans = {}
+        self._root_flags = {}
+        self._generation = 0
+        self._order = []
+        self._visited = set()
+        self._rescanned = set()
+        self._cancel_event = None
+        self._progress = None
+
+    def apply_changes(self, changes):
+        """Update the candidate file list from watcher ``{path: "created"|"modified"|"deleted"}``."""
+        known = set(self.files)
+        for given_path, change in changes.items():
+            path = self._normalize(given_path)
+            if change == "deleted":
+                self.files = [f for f in self.files if f != path]
+                known.discard(path)
+            elif path not in known:
+                self.files.append(path)
+                known.add(path)
+
+    def check(self, files=None, cancel_event=None, progress=None):
+        """Check every root document in ``files`` (default: the previous list) with
+        everything it includes, then each remaining file as a root of its own.
+
+        Returns ``(results, rescanned)``: ``{path: result_dict}`` in visiting order
+        (documents before the files they include) and the set of paths scanned by
+        this call rather than taken over from the previous one. ``progress(path)`` is
+        called after each scan. Each result gets ``include_sites``, the
+        ``{"file", "line", "col"}`` of every include command that pulls the file in.
+        """
+        if files is not None:
+            self._given_paths = {}
+            self.files = [self._normalize(path) for path in files]
+        self._generation += 1
+        self._order = []
+        self._visited = set()
+        self._rescanned = set()
+        self._cancel_event = cancel_event
+        self._progress = progress
+        roots = [path for path in self.files if self._is_root(path)]
+        for path in roots + self.files:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if path not in self._visited:
+                self._visit(path, None, path, frozenset())
+
+        results = {}
+        sites_by_file = {}
+        for key in self._order:
+            scan = self._scans[key]
+            for child, line, col in scan.sites:
+                sites_by_file.setdefault(child, []).append({"file": self._given_paths.get(scan.path, scan.path), "line": line, "col": col})
+            if scan.path in results:
+                results[scan.path] = merge_check_results(results[scan.path], scan.result)
+            else:
+                results[scan.path] = scan.result
+        for path, result in results.items():
+            result["include_sites"] = sites_by_file.get(path, [])
+        results = {self._given_paths.get(path, path): result for path, result in results.items()}
+        self._scans = {key: scan for key, scan in self._scans.items() if scan.generation == self._generation}
+        return results, {self._given_paths.get(path, path) for path in self._rescanned}
+
+    def _normalize(self, given_path):
+        path = os.path.normpath(given_path)
+        self._given_paths[path] = given_path
+        return path
+
+    def _is_root(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        fingerprint = (st.st_mtime_ns, st.st_size)
+        cached = self._root_flags.get(path)
+        if cached is None or cached[0] != fingerprint:
+            cached = self._root_flags[path] = (fingerprint, is_root_document(path))
+        return cached[1]
+
+    def _visit(self, path, entry_math, root, stack):
+        """Return the exit math state of ``path`` entered in ``entry_math``, scanning it
+        unless a scan from an earlier call is still valid."""
+        key = (path, entry_math)
+        scan = self._scans.get(key)
+        if scan is not None and scan.generation == self._generation:
+            return scan.exit_math
+        try:
+            st = os.stat(path)
+            fingerprint = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            fingerprint = None
+        if scan is not None and fingerprint is not None and scan.fingerprint == fingerprint:
+            scan.generation = self._generation
+            self._order.append(key)
+            self._visited.add(path)
+            inner_stack = stack | {path}
+            if (all(resolve_include_path(command, argument, path, root) is None for command, argument in scan.missing)
+                    and all(child not in inner_stack and os.path.isfile(child)
+                            and self._visit(child, child_entry, root, inner_stack) == child_exit
+                            for child, child_entry, child_exit in scan.includes)):
+                return scan.exit_math
+            # Rescan, keeping the place in the visiting order taken above.
+            return self._scan(path, entry_math, fingerprint, root, stack, ordered=True).exit_math
+        return self._scan(path, entry_math, fingerprint, root, stack).exit_math
+
+    def _scan(self, path, entry_math, fingerprint, root, stack, ordered=False):
+        key = (path, entry_math)
+        if not ordered:
+            self._order.append(key)
+            self._visited.add(path)
+        includes = []
+        missing = []
+        site_offsets = []
+        inner_stack = stack | {path}
+
+        def on_include(command, argument, site_start, site_end, math_state):
+            child = resolve_include_path(command, argument, path, root)
+            if child is None:
+                missing.append((command, argument))
+                return math_state
+            if child in inner_stack:
+                return math_state
+            if self._cancel_event is not None and self._cancel_event.is_set():
+                return math_state
+            exit_math = self._visit(child, math_state, root, inner_stack)
+            includes.append((child, math_state, exit_math))
+            site_offsets.append((child, site_start))
+            return exit_math
+
+        try:
+            content, _ = read_tex_file(path)
+        except Exception as e:
+            result = {"error_message": f"Error reading file: {e}", "issues_list": [], "issues_by_target": {}, "searched_char": self.target_spec}
+            exit_math = entry_math
+            sites = []
+        else:
+            regions = classify_tex_regions(content, self.ignored_commands, on_include, entry_math)
+            result = check_tex_content(path, content, self.target_spec, self.ignore_text_commands_flag, self.search_mode, regions)
+            exit_math = regions.exit_math
+            line_index = LineIndex(content) if site_offsets else None
+            sites = [(child, *line_index.line_col(offset)) for child, offset in site_offsets]
+        scan = ProjectScan(path, fingerprint, entry_math, exit_math, includes, missing, sites, result, self._generation)
+        self._scans[key] = scan
+        self._rescanned.add(path)
+        if self._progress is not None:
+            self._progress(self._given_paths.get(path, path))
+        return scan
+
+def merge_check_results(first, second):
+    """Combine two results for the same file (scanned in different entry states),
+    keeping each issue once."""
+    if first["error_message"] or second["error_message"]:
+        return first if first["error_message"] else second
+    seen = {(issue.char_pos, issue.target) for issue in first["issues_list"]}
+    extra = [issue for issue in second["issues_list"] if (issue.char_pos, issue.target) not in seen]
+    if not extra:
+        return first
+    issues_list = sorted(first["issues_list"] + extra, key=lambda x: (x.char_pos, x.detected_char))
+    issues_by_target = {target: [] for target in first["issues_by_target"]}
+    for issue in issues_list:
+        issues_by_target.setdefault(issue.target, []).append(issue)
+    return dict(first, issues_list=issues_list, issues_by_target=issues_by_target)
+
+# --- Watch Mode ---
+WATCH_POLL_INTERVAL_S = 0.5
+# Saves usually arrive as a burst of events (write, close, rename); wait this long for the rest.
+WATCH_DEBOUNCE_S = 0.03
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFY_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+def load_inotify():
+    """Return libc with inotify bound, or None where inotify is unavailable."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+class TexFolderWatcher:
+    """Reports created, modified and deleted .tex files under ``folder``.
+
+    Uses inotify on Linux and falls back to comparing stat snapshots every
+    ``poll_interval`` seconds elsewhere. ``on_changes`` is called on the watcher
+    thread with ``{filepath: "created" | "modified" | "deleted"}``; paths are
+    built like :func:`find_tex_files` builds them, and files and folders it would
+    skip (``excludes``, ``.gitignore``) are not reported.
+    """
+    def __init__(self, folder, on_changes, poll_interval=WATCH_POLL_INTERVAL_S, excludes=DEFAULT_EXCLUDES, use_gitignore=True):
+        self.folder = folder
+        self.on_changes = on_changes
+        self.poll_interval = poll_interval
+        self.excludes = excludes
+        self.use_gitignore = use_gitignore
+        self.accept = make_tex_path_filter(folder, excludes, use_gitignore)
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.backend = None
+
+    def start(self):
+        libc = load_inotify()
+        inotify_fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC) if libc is not None else -1
+        if inotify_fd >= 0:
+            self.backend = "inotify"
+            self.thread = threading.Thread(target=self._run_inotify, args=(libc, inotify_fd), daemon=True)
+        else:
+            self.backend = "polling"
+            self.thread = threading.Thread(target=self._run_polling, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+
+    def _snapshot(self):
+        snapshot = {}
+        for filepath in iter_tex_files(self.folder, self.excludes, self.use_gitignore):
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                continue
+            snapshot[filepath] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def _run_polling(self):
+        previous = self._snapshot()
+        while not self.stop_event.wait(self.poll_interval):
+            current = self._snapshot()
+            changes = {filepath: "deleted" for filepath in previous.keys() - current.keys()}
+            for filepath, stamp in current.items():
+                if filepath not in previous:
+                    changes[filepath] = "created"
+                elif previous[filepath] != stamp:
+                    changes[filepath] = "modified"
+            previous = current
+            if changes:
+                self.on_changes(changes)
+
+    def _run_inotify(self, libc, inotify_fd):
+        watched_dirs = {}
+        known_files = set()
+
+        def watch_tree(top, report_created):
+            created = {}
+            for dirpath, dirnames, filenames in os.walk(top):
+                dirnames[:] = [name for name in dirnames if self.accept(os.path.join(dirpath, name), True)]
+                wd = libc.inotify_add_watch(inotify_fd, os.fsencode(dirpath), INOTIFY_WATCH_MASK)
+                if wd >= 0:
+                    watched_dirs[wd] = dirpath
+                for filename in filenames:
+                    filepath = os.path.join(dirpath, filename)
+                    if filename.lower().endswith(".tex") and self.accept(filepath):
+                        known_files.add(filepath)
+                        created[filepath] = "created"
+            return created if report_created else {}
+
+        def forget_tree(top):
+            prefix = os.path.join(top, "")
+            gone = {filepath for filepath in known_files if filepath.startswith(prefix)}
+            known_files.difference_update(gone)
+            return {filepath: "deleted" for filepath in gone}
+
+        watch_tree(self.folder, False)
+        pending = {}
+        try:
+            while not self.stop_event.is_set():
+                timeout = WATCH_DEBOUNCE_S if pending else 0.2
+                readable, _, _ = select.select([inotify_fd], [], [], timeout)
+                if not readable:
+                    if pending:
+                        changes, pending = pending, {}
+                        self.on_changes(changes)
+                    continue
+                try:
+                    data = os.read(inotify_fd, 64 * 1024)
+                except BlockingIOError:
+                    continue
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, name_len = _INOTIFY_EVENT.unpack_from(data, offset)
+                    name = os.fsdecode(data[offset + _INOTIFY_EVENT.size: offset + _INOTIFY_EVENT.size + name_len].rstrip(b"\0"))
+                    offset += _INOTIFY_EVENT.size + name_len
+                    if mask & IN_Q_OVERFLOW:
+                        # Events were dropped: treat every file as touched.
+                        pending.update({filepath: "modified" for filepath in self._snapshot()})
+                        continue
+                    dirpath = watched_dirs.get(wd)
+                    if dirpath is None:
+                        continue
+                    if mask & (IN_IGNORED | IN_DELETE_SELF):
+                        watched_dirs.pop(wd, None)
+                        continue
+                    path = os.path.join(dirpath, name)
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO):
+                            if self.accept(path, True):
+                                pending.update(watch_tree(path, True))
+                        elif mask & (IN_DELETE | IN_MOVED_FROM):
+                            pending.update(forget_tree(path))
+                        continue
+                    if not name.lower().endswith(".tex") or not (path in known_files or self.accept(path)):
+                        continue
+                    if mask & (IN_DELETE | IN_MOVED_FROM):
+                        known_files.discard(path)
+                        pending[path] = "deleted"
+                    elif mask & (IN_CREATE | IN_MOVED_TO) and path not in known_files:
+                        known_files.add(path)
+                        pending[path] = "created"
+                    elif pending.get(path) != "created":
+                        known_files.add(path)
+                        pending[path] = "modified"
+        finally:
+            os.close(inotify_fd)
 
 # --- GUI Application Class ---
+# Issue rows are added to an opened file row this many at a time.
+ISSUE_PAGE_SIZE = 500
+
 class TexCharCheckerApp:
     def __init__(self, root_window):
         self.root_window = root_window
@@ -160,6 +2140,22 @@ class TexCharCheckerApp:
         self.files_to_check = []
         self.all_results_data = []
         self.last_searched_char = "，"
+        self.displayed_files = set()
+        self.file_items = {}
+        self.item_files = {}
+        self.issue_rows_loaded = {}
+        self.more_items = {}
+        self.file_flags = {}
+        self.results_by_path = {}
+        self.last_check_params = None
+        self.last_project = None
+        self.watcher = None
+        self.watch_queue = None
+        self.discovery_queue = None
+        self.discovery_excludes = DEFAULT_EXCLUDES
+        self.scan_profile = None
+        self.last_profile = None
+        self.rule_file_path = None
         
         # Configuration for search modes (text and value)
         self.search_modes_config = [
@@ -187,13 +2183,17 @@ class TexCharCheckerApp:
         self.selected_folder_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         self.num_files_label = ttk.Label(folder_select_frame, text="TeXファイル数: 0")
         self.num_files_label.pack(side=tk.LEFT, padx=5)
+        ttk.Label(folder_select_frame, text="除外:").pack(side=tk.LEFT)
+        self.exclude_var = tk.StringVar(value=" ".join(DEFAULT_EXCLUDES))
+        self.exclude_entry = ttk.Entry(folder_select_frame, textvariable=self.exclude_var, width=14)
+        self.exclude_entry.pack(side=tk.LEFT, padx=5)
 
         options_run_frame = ttk.LabelFrame(top_frame, text="オプションと実行", padding="5")
         options_run_frame.pack(side=tk.LEFT, padx=5, fill=tk.Y)
 
-        ttk.Label(options_run_frame, text="検査文字:").grid(row=0, column=0, padx=5, pady=2, sticky=tk.W)
+        ttk.Label(options_run_frame, text="検査文字(空白区切りで複数可):").grid(row=0, column=0, padx=5, pady=2, sticky=tk.W)
         self.target_char_var = tk.StringVar(value="，")
-        self.target_char_entry = ttk.Entry(options_run_frame, textvariable=self.target_char_var, width=10)
+        self.target_char_entry = ttk.Entry(options_run_frame, textvariable=self.target_char_var, width=16)
         self.target_char_entry.grid(row=0, column=1, padx=5, pady=2, sticky=tk.EW)
 
         ttk.Label(options_run_frame, text="検査範囲:").grid(row=1, column=0, padx=5, pady=2, sticky=tk.W)
@@ -209,9 +2209,41 @@ class TexCharCheckerApp:
             options_run_frame, text="\\text{}等無視(実験的, 数式内のみ)", variable=self.ignore_text_var
         )
         self.ignore_text_check.grid(row=2+len(self.search_modes_config), column=0, columnspan=2, padx=5, pady=2, sticky=tk.W)
+        ttk.Label(options_run_frame, text="無視するコマンド:").grid(row=3+len(self.search_modes_config), column=0, padx=5, pady=2, sticky=tk.W)
+        self.ignored_commands_var = tk.StringVar(value=" ".join(sorted(DEFAULT_IGNORED_TEXT_COMMANDS)))
+        self.ignored_commands_entry = ttk.Entry(options_run_frame, textvariable=self.ignored_commands_var, width=16)
+        self.ignored_commands_entry.grid(row=3+len(self.search_modes_config), column=1, padx=5, pady=2, sticky=tk.EW)
+
+        self.project_var = tk.BooleanVar()
+        self.project_check = ttk.Checkbutton(
+            options_run_frame, text="プロジェクトモード(\\input等を辿る)", variable=self.project_var
+        )
+        self.project_check.grid(row=4+len(self.search_modes_config), column=0, columnspan=2, padx=5, pady=2, sticky=tk.W)
+
+        self.use_cache_var = tk.BooleanVar(value=True)
+        self.use_cache_check = ttk.Checkbutton(options_run_frame, text="結果キャッシュを使う(プロジェクトモード以外)", variable=self.use_cache_var)
+        self.use_cache_check.grid(row=5+len(self.search_modes_config), column=0, columnspan=2, padx=5, pady=2, sticky=tk.W)
+
+        self.watch_var = tk.BooleanVar()
+        self.watch_check = ttk.Checkbutton(
+            options_run_frame, text="監視モード(保存時に自動再検査)", variable=self.watch_var, command=self.toggle_watch
+        )
+        self.watch_check.grid(row=6+len(self.search_modes_config), column=0, columnspan=2, padx=5, pady=2, sticky=tk.W)
+
+        self.profile_var = tk.BooleanVar()
+        self.profile_check = ttk.Checkbutton(options_run_frame, text="プロファイル(遅いファイルを表示)", variable=self.profile_var)
+        self.profile_check.grid(row=7+len(self.search_modes_config), column=0, columnspan=2, padx=5, pady=2, sticky=tk.W)
+
+        rule_file_frame = ttk.Frame(options_run_frame)
+        rule_file_frame.grid(row=8+len(self.search_modes_config), column=0, columnspan=2, padx=5, pady=2, sticky=tk.EW)
+        ttk.Label(rule_file_frame, text="ルール:").pack(side=tk.LEFT)
+        self.rule_file_label = ttk.Label(rule_file_frame, text="なし", width=14)
+        self.rule_file_label.pack(side=tk.LEFT, padx=5)
+        ttk.Button(rule_file_frame, text="解除", width=4, command=self.clear_rule_file).pack(side=tk.RIGHT)
+        ttk.Button(rule_file_frame, text="読込...", width=6, command=self.select_rule_file).pack(side=tk.RIGHT, padx=2)
 
         self.run_button = ttk.Button(options_run_frame, text="検査実行", command=self.run_check)
-        self.run_button.grid(row=3+len(self.search_modes_config), column=0, columnspan=2, padx=5, pady=5, sticky=tk.EW)
+        self.run_button.grid(row=9+len(self.search_modes_config), column=0, columnspan=2, padx=5, pady=5, sticky=tk.EW)
         
         filter_frame = ttk.LabelFrame(root_window, text="結果フィルタ", padding="10")
         filter_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -228,20 +2260,57 @@ class TexCharCheckerApp:
             rb.pack(side=tk.LEFT, padx=10)
         self.clear_button = ttk.Button(filter_frame, text="結果クリア", command=self.clear_all_data_and_display)
         self.clear_button.pack(side=tk.RIGHT, padx=5)
+        self.clear_cache_button = ttk.Button(filter_frame, text="キャッシュ削除", command=self.clear_result_cache)
+        self.clear_cache_button.pack(side=tk.RIGHT, padx=5)
+        self.save_profile_button = ttk.Button(filter_frame, text="プロファイル保存", command=self.save_profile, state='disabled')
+        self.save_profile_button.pack(side=tk.RIGHT, padx=5)
 
         results_display_frame = ttk.Frame(root_window, padding="10")
         results_display_frame.pack(fill=tk.BOTH, expand=True)
-        self.results_text = scrolledtext.ScrolledText(results_display_frame, wrap=tk.WORD, height=20, width=90)
-        self.results_text.pack(fill=tk.BOTH, expand=True)
-        self.results_text.configure(state='disabled')
+        self.results_header_label = ttk.Label(results_display_frame, text="")
+        self.results_header_label.pack(fill=tk.X)
+        self.results_tree = ttk.Treeview(results_display_frame, columns=("char", "type", "detail"), height=20)
+        self.results_tree.heading("#0", text="ファイル / 位置")
+        self.results_tree.heading("char", text="文字")
+        self.results_tree.heading("type", text="種類")
+        self.results_tree.heading("detail", text="内容")
+        self.results_tree.column("#0", width=240, stretch=False)
+        self.results_tree.column("char", width=50, stretch=False, anchor=tk.CENTER)
+        self.results_tree.column("type", width=180, stretch=False)
+        self.results_tree.column("detail", width=330)
+        results_scrollbar = ttk.Scrollbar(results_display_frame, orient=tk.VERTICAL, command=self.results_tree.yview)
+        self.results_tree.configure(yscrollcommand=results_scrollbar.set)
+        results_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.results_tree.pack(fill=tk.BOTH, expand=True)
+        self.results_tree.bind("<<TreeviewOpen>>", self.on_results_tree_open)
+        self.results_tree.bind("<<TreeviewSelect>>", self.on_results_tree_select)
 
         self.summary_label = ttk.Label(root_window, text="サマリー: まだ検査していません", padding="5")
         self.summary_label.pack(fill=tk.X, padx=10, pady=5)
+        # Shown below the summary after a profiled check.
+        self.profile_label = ttk.Label(root_window, text="", padding="5", font="TkFixedFont", justify=tk.LEFT)
 
         style = ttk.Style()
         try: style.theme_use('clam')
         except tk.TclError: print("Clam theme not available, using default.")
 
+    def select_rule_file(self):
+        path = filedialog.askopenfilename(parent=self.root_window, title="ルールファイルを選択",
+                                          filetypes=[("JSON", "*.json"), ("すべてのファイル", "*.*")])
+        if not path:
+            return
+        try:
+            rule_set = RuleSet.load(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("ルールエラー", f"ルールファイルを読み込めません: {e}", parent=self.root_window)
+            return
+        self.rule_file_path = path
+        self.rule_file_label.config(text=f"{os.path.basename(path)} ({len(rule_set.rules)}件)")
+
+    def clear_rule_file(self):
+        self.rule_file_path = None
+        self.rule_file_label.config(text="なし")
+
     def select_folder_dialog(self):
         folderpath = filedialog.askdirectory(title="検査対象のルートフォルダを選択")
         if folderpath:
@@ -257,20 +2326,72 @@ class TexCharCheckerApp:
     def find_tex_files_in_folder(self):
         self.files_to_check = []
         if not self.selected_folder: return
-        for dirpath, _, filenames in os.walk(self.selected_folder):
-            for filename in filenames:
-                if filename.lower().endswith(".tex"):
-                    self.files_to_check.append(os.path.join(dirpath, filename))
+        # The walk runs on a worker thread; paths come back in batches through a queue
+        # of its own, so a walk still running for a previously chosen folder is ignored.
+        self.discovery_excludes = tuple(parse_exclude_entry(self.exclude_var.get()))
+        self.discovery_queue = queue.Queue()
+        self.run_button.config(state='disabled')
+        self.num_files_label.config(text="TeXファイル数: 0 (検索中...)")
+        threading.Thread(
+            target=self._discover_in_background,
+            args=(self.selected_folder, self.discovery_excludes, self.discovery_queue),
+            daemon=True,
+        ).start()
+        self.root_window.after(SCAN_POLL_INTERVAL_MS, self._poll_discovery_queue, self.discovery_queue)
+
+    @staticmethod
+    def _discover_in_background(folder, excludes, out_queue):
+        batch = []
+        last_put = time.monotonic()
+        try:
+            for filepath in iter_tex_files(folder, excludes):
+                batch.append(filepath)
+                if time.monotonic() - last_put >= SCAN_POLL_INTERVAL_MS / 1000:
+                    out_queue.put(batch)
+                    batch = []
+                    last_put = time.monotonic()
+        except Exception as e:
+            out_queue.put(e)
+        out_queue.put(batch)
+        out_queue.put(None)
+
+    def _poll_discovery_queue(self, discovery_queue):
+        if discovery_queue is not self.discovery_queue:
+            return
+        finished = False
+        try:
+            while True:
+                item = discovery_queue.get_nowait()
+                if item is None:
+                    finished = True
+                    break
+                if isinstance(item, Exception):
+                    messagebox.showerror("検索エラー", f"ファイルの検索中にエラーが発生しました: {item}", parent=self.root_window)
+                    continue
+                self.files_to_check.extend(item)
+        except queue.Empty:
+            pass
+        if not finished:
+            self.num_files_label.config(text=f"TeXファイル数: {len(self.files_to_check)} (検索中...)")
+            self.root_window.after(SCAN_POLL_INTERVAL_MS, self._poll_discovery_queue, discovery_queue)
+            return
+        self.discovery_queue = None
         self.num_files_label.config(text=f"TeXファイル数: {len(self.files_to_check)}")
-        if not self.files_to_check and self.selected_folder:
+        self.run_button.config(state='normal')
+        if not self.files_to_check:
              messagebox.showinfo("ファイルなし", f"{self.selected_folder} 以下に .tex ファイルが見つかりませんでした。", parent=self.root_window)
 
     def clear_all_data_and_display(self):
+        self.stop_watch()
+        self.last_check_params = None
+        self.last_project = None
         self.all_results_data = []
-        self.results_text.configure(state='normal')
-        self.results_text.delete(1.0, tk.END)
-        self.results_text.configure(state='disabled')
+        self.displayed_files = set()
+        self.results_tree.delete(*self.results_tree.get_children())
+        self.results_header_label.config(text="")
         self.summary_label.config(text="サマリー: 結果がクリアされました。")
+        self.last_profile = None
+        self.show_profile()
         self.last_searched_char = self.target_char_var.get()
         self.last_search_mode = self.search_mode_var.get()
 
@@ -283,22 +2404,48 @@ class TexCharCheckerApp:
             return
 
         target_char_to_check = self.target_char_var.get()
-        if not target_char_to_check:
+        if not target_char_to_check and not self.rule_file_path:
             messagebox.showwarning("検査文字未入力", "検査する文字を入力してください。", parent=self.root_window)
             return
+        # The rule file is read again on every run, so edits to it take effect.
+        rule_set = None
+        if self.rule_file_path:
+            try:
+                rule_set = RuleSet.load(self.rule_file_path)
+            except (OSError, ValueError) as e:
+                messagebox.showerror("ルールエラー", f"ルールファイルを読み込めません: {e}", parent=self.root_window)
+                return
         
+        targets_to_check = parse_target_entry(target_char_to_check)
         current_search_mode = self.search_mode_var.get()
-        self.last_searched_char = target_char_to_check
+        searched_text = " ".join(targets_to_check)
+        if rule_set is not None:
+            searched_text = f"{searched_text} +ルール({os.path.basename(self.rule_file_path)})".strip()
+            try:
+                targets_to_check = RuleSet.from_targets(targets_to_check, current_search_mode) + rule_set if targets_to_check else rule_set
+            except ValueError as e:
+                # A rule id equal to a target character.
+                messagebox.showerror("ルールエラー", f"検査文字とルールを組み合わせられません: {e}", parent=self.root_window)
+                return
+        self.last_searched_char = searched_text
         self.last_search_mode = current_search_mode
 
+        self.stop_watch()
         self.all_results_data = []
-        ignore_text_flag = self.ignore_text_var.get()
+        # An empty command list falls back to the defaults.
+        ignore_text_flag = (self.ignored_commands_var.get().strip() or True) if self.ignore_text_var.get() else False
+        self.pending_check_params = (targets_to_check, ignore_text_flag, current_search_mode)
+        # Project mode keeps its scans and include graph for the watch re-checks.
+        self.pending_project = TexProject(targets_to_check, ignore_text_flag, current_search_mode) if self.project_var.get() else None
+        # Project scans do not go through check_tex_file, so they are not profiled.
+        self.scan_profile = ScanProfile() if self.profile_var.get() and self.pending_project is None else None
         
         progress_window = tk.Toplevel(self.root_window)
         progress_window.title("検査中...")
-        progress_window.geometry("350x80")
+        progress_window.geometry("350x120")
         progress_window.transient(self.root_window)
         progress_window.grab_set()
+        progress_window.protocol("WM_DELETE_WINDOW", self.cancel_check)
         
         search_mode_display_text = current_search_mode 
         for text, val in self.search_modes_config:
@@ -307,144 +2454,664 @@ class TexCharCheckerApp:
                 break
         
         ttk.Label(progress_window, text=f"検査文字 '{target_char_to_check}' (範囲: {search_mode_display_text}) で検査中...").pack(pady=10)
-        progress_var = tk.DoubleVar()
-        progress_bar = ttk.Progressbar(progress_window, variable=progress_var, maximum=len(self.files_to_check), length=330)
+        self.progress_var = tk.DoubleVar()
+        progress_bar = ttk.Progressbar(progress_window, variable=self.progress_var, maximum=len(self.files_to_check), length=330)
         progress_bar.pack(pady=5)
-        self.root_window.update_idletasks()
-
-        for i, filepath in enumerate(self.files_to_check):
-            result_dict = find_target_char_in_tex(filepath, target_char_to_check, ignore_text_flag, current_search_mode)
-            self.all_results_data.append((filepath, result_dict))
-            
-            progress_var.set(i + 1)
-            if i % 5 == 0 or i == len(self.files_to_check) - 1:
-                progress_window.update_idletasks()
-        
-        progress_window.destroy()
+        self.cancel_button = ttk.Button(progress_window, text="キャンセル", command=self.cancel_check)
+        self.cancel_button.pack(pady=5)
+        self.progress_window = progress_window
+        self.run_button.config(state='disabled')
+
+        # Results arrive in completion order; slots keep them in self.files_to_check order.
+        files = list(self.files_to_check)
+        self.scan_result_slots = [None] * len(files)
+        self.scan_done_count = 0
+        self.scan_queue = queue.Queue()
+        self.scan_cancel_event = threading.Event()
+        threading.Thread(
+            target=self._scan_in_background,
+            args=(files, targets_to_check, ignore_text_flag, current_search_mode, self.use_cache_var.get(), self.pending_project,
+                  self.scan_profile is not None),
+            daemon=True,
+        ).start()
+        self.root_window.after(SCAN_POLL_INTERVAL_MS, self._poll_scan_queue)
+
+    def _scan_in_background(self, files, targets, ignore_text_flag, search_mode, use_cache, project=None, profile=False):
+        # Runs on a worker thread: only talks to the GUI through self.scan_queue.
+        # The cache is opened here because a SQLite connection stays on its own thread.
+        if project is not None:
+            # Results only come at the end, so each newly scanned file is posted as its
+            # path for the progress bar.
+            scanned = set()
+
+            def progress(path):
+                if path not in scanned:
+                    scanned.add(path)
+                    self.scan_queue.put(path)
+            try:
+                results, _ = project.check(files, cancel_event=self.scan_cancel_event, progress=progress)
+                # Files included from outside the folder get slots after the folder's files.
+                index_by_path = {filepath: i for i, filepath in enumerate(files)}
+                for filepath, result_dict in results.items():
+                    index = index_by_path.setdefault(filepath, len(index_by_path))
+                    self.scan_queue.put((index, filepath, result_dict))
+            except Exception as e:
+                self.scan_queue.put(e)
+            self.scan_queue.put(None)
+            return
+        cache = open_result_cache() if use_cache else None
+        try:
+            for item in iter_check_results(files, targets, ignore_text_flag, search_mode,
+                                           cancel_event=self.scan_cancel_event, cache=cache, profile=profile):
+                self.scan_queue.put(item)
+        except Exception as e:
+            self.scan_queue.put(e)
+        finally:
+            if cache is not None:
+                cache.close()
+        self.scan_queue.put(None)
+
+    def clear_result_cache(self):
+        cache = open_result_cache()
+        if cache is None:
+            messagebox.showwarning("キャッシュ", "結果キャッシュを開けませんでした。", parent=self.root_window)
+            return
+        cache.clear()
+        cache.close()
+        self.summary_label.config(text="サマリー: 結果キャッシュを削除しました。")
+
+    def _poll_scan_queue(self):
+        finished = False
+        scan_error = None
+        try:
+            while True:
+                item = self.scan_queue.get_nowait()
+                if item is None:
+                    finished = True
+                    break
+                if isinstance(item, Exception):
+                    scan_error = item
+                    continue
+                if isinstance(item, str):
+                    self.scan_done_count += 1
+                    continue
+                index, filepath, result_dict = item
+                if self.scan_profile is not None:
+                    self.scan_profile.add_result(filepath, result_dict)
+                if index >= len(self.scan_result_slots):
+                    self.scan_result_slots.extend([None] * (index + 1 - len(self.scan_result_slots)))
+                self.scan_result_slots[index] = (filepath, result_dict)
+                if self.pending_project is None:
+                    self.scan_done_count += 1
+        except queue.Empty:
+            pass
+        self.progress_var.set(self.scan_done_count)
+        if finished:
+            self._finish_check(scan_error)
+        else:
+            self.root_window.after(SCAN_POLL_INTERVAL_MS, self._poll_scan_queue)
+
+    def _finish_check(self, scan_error=None):
+        self.all_results_data = [entry for entry in self.scan_result_slots if entry is not None]
+        self.scan_result_slots = []
+        self.progress_window.grab_release()
+        self.progress_window.destroy()
+        self.run_button.config(state='normal')
+        if scan_error is not None:
+            messagebox.showerror("検査エラー", f"検査中にエラーが発生しました: {scan_error}", parent=self.root_window)
+        self.last_check_params = self.pending_check_params
+        self.last_project = self.pending_project
+        if self.watch_var.get():
+            self.start_watch()
+        if self.scan_profile is not None:
+            self.scan_profile.finish()
+            render_start = time.perf_counter()
+        self.populate_results_view()
+        if self.scan_profile is not None:
+            self.scan_profile.add_stage("render", time.perf_counter() - render_start)
+        self.last_profile = self.scan_profile
+        self.scan_profile = None
+        self.show_profile()
+        if self.scan_cancel_event.is_set():
+            self.summary_label.config(text=self.summary_label.cget("text") + " (キャンセルされました)")
+
+    def show_profile(self):
+        """Show the slowest-files table of the last profiled check under the summary."""
+        if self.last_profile is None:
+            self.profile_label.pack_forget()
+            self.save_profile_button.config(state='disabled')
+            return
+        lines = self.last_profile.format_table(relative_to=self.selected_folder)
+        self.profile_label.config(text=f"プロファイル (遅いファイル上位{PROFILE_TOP_FILES}件):\n" + "\n".join(lines))
+        self.profile_label.pack(fill=tk.X, padx=10, pady=(0, 5))
+        self.save_profile_button.config(state='normal')
+
+    def save_profile(self):
+        if self.last_profile is None:
+            return
+        path = filedialog.asksaveasfilename(parent=self.root_window, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")], initialfile="tex_char_checker_profile.json")
+        if not path:
+            return
+        try:
+            self.last_profile.write_json(path)
+        except OSError as e:
+            messagebox.showerror("保存エラー", f"プロファイルを保存できませんでした: {e}", parent=self.root_window)
+
+    def cancel_check(self):
+        self.scan_cancel_event.set()
+        self.cancel_button.config(text="キャンセル中...", state='disabled')
+
+    def toggle_watch(self):
+        if not self.watch_var.get():
+            self.stop_watch()
+            self.update_summary()
+        elif self.last_check_params is not None:
+            self.start_watch()
+            self.update_summary()
+        else:
+            messagebox.showinfo("監視モード", "次の「検査実行」の完了後に監視を開始します。", parent=self.root_window)
+
+    def start_watch(self):
+        self.stop_watch()
+        params = self.last_check_params
+        project = self.last_project
+        # Each watcher session gets its own queue, so updates it leaves behind are never
+        # applied to a later check.
+        watch_queue = self.watch_queue = queue.Queue()
+        self.watcher = TexFolderWatcher(self.selected_folder,
+                                        lambda changes: self._check_changed_files(changes, params, watch_queue, project),
+                                        excludes=self.discovery_excludes)
+        self.watcher.start()
+        self.root_window.after(SCAN_POLL_INTERVAL_MS, self._poll_watch_queue, watch_queue)
+
+    def stop_watch(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        self.watch_queue = None
+
+    def _check_changed_files(self, changes, params, watch_queue, project=None):
+        # Runs on the watcher thread; results go back to the GUI through watch_queue.
+        updates = []
+        if project is not None:
+            # Only the changed files and those whose include context changed are rescanned.
+            project.apply_changes(changes)
+            results, rescanned = project.check()
+            updates = [(filepath, None) for filepath, change in changes.items() if change == "deleted"]
+            updates.extend((filepath, results[filepath]) for filepath in rescanned if filepath in results)
+            watch_queue.put(updates)
+            return
+        for filepath, change in changes.items():
+            if change == "deleted":
+                updates.append((filepath, None))
+            else:
+                result_dict, _ = check_tex_file(filepath, *params)
+                updates.append((filepath, result_dict))
+        watch_queue.put(updates)
+
+    def _poll_watch_queue(self, watch_queue):
+        if watch_queue is not self.watch_queue:
+            return
+        updates = []
+        try:
+            while True:
+                updates.extend(watch_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if updates:
+            self.apply_watch_updates(updates)
+        self.root_window.after(SCAN_POLL_INTERVAL_MS, self._poll_watch_queue, watch_queue)
+
+    def apply_watch_updates(self, updates):
+        """Patch all_results_data in place with re-checked (or deleted, result None) files
+        and re-render only their blocks."""
+        index_by_path = {filepath: i for i, (filepath, _) in enumerate(self.all_results_data)}
+        known_files = set(self.files_to_check)
+        removed = set()
+        changed = []
+        for filepath, result_dict in updates:
+            index = index_by_path.get(filepath)
+            if result_dict is None:
+                if index is not None or filepath in known_files:
+                    removed.add(filepath)
+                    changed.append(filepath)
+                continue
+            removed.discard(filepath)
+            if index is None:
+                index_by_path[filepath] = len(self.all_results_data)
+                self.all_results_data.append((filepath, result_dict))
+            else:
+                self.all_results_data[index] = (filepath, result_dict)
+            if filepath not in known_files:
+                known_files.add(filepath)
+                self.files_to_check.append(filepath)
+            changed.append(filepath)
+        if removed:
+            self.all_results_data = [entry for entry in self.all_results_data if entry[0] not in removed]
+            self.files_to_check = [filepath for filepath in self.files_to_check if filepath not in removed]
+        self.num_files_label.config(text=f"TeXファイル数: {len(self.files_to_check)}")
+        self.refresh_file_results(changed)
+
+    def search_mode_display_text(self, search_mode):
+        for text, val in self.search_modes_config:
+            if val == search_mode:
+                return text
+        return search_mode
+
+    @staticmethod
+    def file_passes_filter(has_error, has_issues, current_filter):
+        if current_filter == "all": return True
+        if current_filter == "issues_only": return has_issues and not has_error
+        if current_filter == "no_issues": return not has_issues and not has_error
+        if current_filter == "errors_only": return has_error
+        return False
+
+    def populate_results_view(self):
+        """Rebuild the file rows from all_results_data. Issue rows are only created
+        when a file row is opened (see load_issue_page)."""
+        self.results_tree.delete(*self.results_tree.get_children())
+        self.file_items = {}
+        self.item_files = {}
+        self.issue_rows_loaded = {}
+        self.more_items = {}
+        self.file_flags = {}
+        self.results_by_path = {}
+        for filepath, result_data in self.all_results_data:
+            self.insert_file_row(filepath, result_data)
         self.apply_filter_and_display()
 
+    def insert_file_row(self, filepath, result_data):
+        error_msg = result_data.get("error_message")
+        issues_list = result_data.get("issues_list", [])
+        self.file_flags[filepath] = (bool(error_msg), bool(issues_list))
+        self.results_by_path[filepath] = result_data
+
+        if error_msg:
+            values = ("", "エラー", error_msg)
+        elif issues_list:
+            issues_by_target = result_data.get("issues_by_target") or {self.last_searched_char: issues_list}
+            per_target = "  ".join(f"'{target}': {len(target_issues)}件" for target, target_issues in issues_by_target.items() if target_issues)
+            values = ("", f"{len(issues_list)}件", per_target)
+        else:
+            values = ("", "問題なし", f"'{self.last_searched_char}' なし (範囲: {self.search_mode_display_text(self.last_search_mode)})")
+        include_sites = result_data.get("include_sites")
+        if include_sites:
+            sites_text = ", ".join(f"{os.path.relpath(site['file'], self.selected_folder)}:{site['line']}" for site in include_sites)
+            values = values[:2] + (f"{values[2]}  [取込元: {sites_text}]",)
+        iid = self.results_tree.insert("", "end", text=os.path.relpath(filepath, self.selected_folder), values=values)
+        if issues_list and not error_msg:
+            self.results_tree.insert(iid, "end", text="...")  # placeholder so the row can be opened
+        self.file_items[filepath] = iid
+        self.item_files[iid] = filepath
+        self.issue_rows_loaded[iid] = 0
+        return iid
+
+    def load_issue_page(self, file_iid):
+        result_data = self.results_by_path[self.item_files[file_iid]]
+        issues_by_target = result_data.get("issues_by_target") or {self.last_searched_char: result_data["issues_list"]}
+        issues = [issue for target_issues in issues_by_target.values() for issue in target_issues]
+        start = self.issue_rows_loaded[file_iid]
+        end = min(start + ISSUE_PAGE_SIZE, len(issues))
+        for issue in issues[start:end]:
+            issue_type, detail = issue.type, issue.snippet or issue.context
+            if issue.rule is not None:
+                issue_type = f"[{issue.rule.severity}] {issue.rule.id}"
+                if issue.rule.message:
+                    detail = f"{issue.rule.message} | {detail}"
+            self.results_tree.insert(file_iid, "end", text=f"L{issue.line}:{issue.col}",
+                                     values=(issue.detected_char, issue_type, detail))
+        self.issue_rows_loaded[file_iid] = end
+        if end < len(issues):
+            more_iid = self.results_tree.insert(file_iid, "end", text="...", values=("", "", f"さらに表示 (残り {len(issues) - end}件)"))
+            self.more_items[more_iid] = file_iid
+
+    def on_results_tree_open(self, event):
+        file_iid = self.results_tree.focus()
+        if file_iid not in self.item_files or self.issue_rows_loaded.get(file_iid):
+            return
+        self.results_tree.delete(*self.results_tree.get_children(file_iid))
+        self.load_issue_page(file_iid)
+
+    def on_results_tree_select(self, event):
+        for iid in self.results_tree.selection():
+            file_iid = self.more_items.pop(iid, None)
+            if file_iid is not None:
+                self.results_tree.delete(iid)
+                self.load_issue_page(file_iid)
+
     def apply_filter_and_display(self):
         if not self.all_results_data and self.files_to_check:
             self.summary_label.config(text="サマリー: まず「検査実行」をしてください。")
-            self.results_text.configure(state='normal')
-            self.results_text.delete(1.0, tk.END)
-            self.results_text.insert(tk.END, "検査結果がありません。「検査実行」ボタンを押してください。")
-            self.results_text.configure(state='disabled')
+            self.results_tree.delete(*self.results_tree.get_children())
+            self.results_header_label.config(text="検査結果がありません。「検査実行」ボタンを押してください。")
             return
         if not self.all_results_data:
             self.summary_label.config(text="サマリー: フォルダを選択し、検査を実行してください。")
             return
 
-        self.results_text.configure(state='normal')
-        self.results_text.delete(1.0, tk.END)
-
+        # Filtering only detaches/reattaches the existing file rows using their precomputed flags.
         current_filter = self.filter_var.get()
-        output_count = 0
+        self.displayed_files = set()
+        for filepath, _ in self.all_results_data:
+            iid = self.file_items.get(filepath)
+            if iid is None:
+                continue
+            has_error, has_issues = self.file_flags[filepath]
+            if self.file_passes_filter(has_error, has_issues, current_filter):
+                self.results_tree.move(iid, "", len(self.displayed_files))
+                self.displayed_files.add(filepath)
+            else:
+                self.results_tree.detach(iid)
+
+        searched_char_for_display = self.last_searched_char
+        search_mode_display_text = self.search_mode_display_text(self.last_search_mode)
+        if self.displayed_files:
+            self.results_header_label.config(text=f"--- 検査文字 '{searched_char_for_display}' (範囲: {search_mode_display_text}) の結果 ---")
+        else:
+            self.results_header_label.config(text=f"選択されたフィルタ '{self.filter_var_options.get(current_filter, current_filter)}' に一致するファイルはありませんでした (検査文字: '{searched_char_for_display}', 範囲: {search_mode_display_text})。")
+        self.update_summary()
+
+    def refresh_file_results(self, changed_paths):
+        """Replace the rows of ``changed_paths`` after all_results_data was patched,
+        leaving every other row (and its loaded issues) in place."""
+        current_results = dict(self.all_results_data)
+        for filepath in changed_paths:
+            old_iid = self.file_items.pop(filepath, None)
+            was_open = False
+            if old_iid is not None:
+                was_open = bool(self.results_tree.item(old_iid, "open"))
+                self.results_tree.delete(old_iid)
+                del self.item_files[old_iid]
+                del self.issue_rows_loaded[old_iid]
+                self.file_flags.pop(filepath, None)
+                self.results_by_path.pop(filepath, None)
+            result_data = current_results.get(filepath)
+            if result_data is None:
+                continue
+            iid = self.insert_file_row(filepath, result_data)
+            if was_open and self.file_flags[filepath][1]:
+                self.results_tree.delete(*self.results_tree.get_children(iid))
+                self.load_issue_page(iid)
+                self.results_tree.item(iid, open=True)
+        self.apply_filter_and_display()
+
+    def update_summary(self):
         total_processed = len(self.all_results_data)
         files_with_issues_summary = 0
         total_individual_issues_summary = 0
         files_with_errors_summary = 0
-        
-        searched_char_for_display = self.last_searched_char
-        search_mode_for_display_val = self.last_search_mode
-        
-        search_mode_display_text = search_mode_for_display_val
-        for text, val in self.search_modes_config:
-            if val == search_mode_for_display_val:
-                search_mode_display_text = text
-                break
+        for _, result_data in self.all_results_data:
+            issues_list = result_data.get("issues_list", [])
+            if result_data.get("error_message"): files_with_errors_summary += 1
+            if issues_list:
+                files_with_issues_summary += 1
+                total_individual_issues_summary += len(issues_list)
 
-        self.results_text.insert(tk.END, f"--- 検査文字 '{searched_char_for_display}' (範囲: {search_mode_display_text}) の結果 ---\n\n")
+        summary_text = (f"サマリー (文字:'{self.last_searched_char}', 範囲:{self.search_mode_display_text(self.last_search_mode)}): {total_processed}ファイル検査完了。 "
+                        f"問題あり: {files_with_issues_summary}ファイル ({total_individual_issues_summary}件)。 "
+                        f"エラー: {files_with_errors_summary}ファイル。 "
+                        f"(現在 {len(self.displayed_files)}ファイル表示中)")
+        if self.watcher is not None:
+            summary_text += f" [監視中: {self.watcher.backend}]"
+        self.summary_label.config(text=summary_text)
 
-        for filepath, result_data in self.all_results_data:
-            relative_filepath = os.path.relpath(filepath, self.selected_folder)
-            error_msg = result_data.get("error_message")
-            issues_list = result_data.get("issues_list", [])
+# --- Command Line Interface ---
+CLI_OUTPUT_FORMATS = ("jsonl", "sarif")
+SARIF_SCHEMA_URI = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_LEVELS = {"error": "error", "warning": "warning", "info": "note"}
 
-            has_error = bool(error_msg)
-            has_issues = bool(issues_list)
+def parse_cli_target(text):
+    """Split "，=text_only_strict" into ("，", "text_only_strict"); other text is a plain target."""
+    target, sep, mode = text.rpartition("=")
+    if sep and target and mode in SEARCH_MODES:
+        return target, mode
+    return text, None
 
-            if has_error: files_with_errors_summary += 1
-            if has_issues: 
-                files_with_issues_summary +=1
-                total_individual_issues_summary += len(issues_list)
+def collect_cli_files(paths, excludes=DEFAULT_EXCLUDES, use_gitignore=True):
+    """Yield the files to check; folders are walked lazily so checking can start
+    before the walk is finished."""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_tex_files(path, excludes, use_gitignore)
+        else:
+            yield path
 
-            display_this_file = False
-            if current_filter == "all": display_this_file = True
-            elif current_filter == "issues_only" and has_issues and not has_error: display_this_file = True
-            elif current_filter == "no_issues" and not has_issues and not has_error: display_this_file = True
-            elif current_filter == "errors_only" and has_error: display_this_file = True
-            
-            if display_this_file:
-                output_count += 1
-                if has_error:
-                    self.results_text.insert(tk.END, f"--- ERROR checking {relative_filepath} ---\n")
-                    self.results_text.insert(tk.END, f"  {error_msg}\n")
-                elif has_issues:
-                    issue_type_display = issues_list[0].get('type', 'Unknown type') if issues_list else 'Issues'
-                    self.results_text.insert(tk.END, f"--- ISSUES ('{searched_char_for_display}') in '{issue_type_display}' in {relative_filepath} ---\n")
-                    for issue in issues_list:
-                        detected_char_display = issue.get('detected_char', searched_char_for_display)
-                        self.results_text.insert(tk.END, 
-                            f"{os.path.relpath(issue['file'], self.selected_folder)}:{issue['line']}:{issue['col']}: "
-                            f"'{detected_char_display}' in '{issue['type']}'.\n"
-                        )
-                        self.results_text.insert(tk.END, f"  L{issue['line']}: {issue['context']}\n")
-                        
-                        col_in_context = issue['col'] - 1
-                        snippet_window = 15
-                        detected_len = len(issue.get('detected_char', ''))
-                        
-                        # Find actual start of detected_char in context for robust highlighting
-                        highlight_start_in_context = -1
-                        # Try to find around the expected column, case-insensitively if needed
-                        search_start_highlight = max(0, col_in_context - snippet_window//2) # Search a bit before
-                        search_end_highlight = min(len(issue['context']), col_in_context + detected_len + snippet_window//2) # Search a bit after
-                        try:
-                            highlight_start_in_context = issue['context'].lower().index(detected_char_display.lower(), search_start_highlight, search_end_highlight)
-                        except ValueError:
-                             # If not found in the vicinity, fall back to col_in_context if it's plausible
-                            if 0 <= col_in_context < len(issue['context']) and \
-                               issue['context'][col_in_context : col_in_context + detected_len].lower() == detected_char_display.lower():
-                                highlight_start_in_context = col_in_context
-                            else: # Still not found, can't highlight accurately
-                                 pass # Will skip highlight or use a generic message
-
-                        if highlight_start_in_context != -1:
-                            actual_highlighted_segment = issue['context'][highlight_start_in_context : highlight_start_in_context + detected_len]
-                            snippet_display_start = max(0, highlight_start_in_context - snippet_window)
-                            snippet_display_end = min(len(issue['context']), highlight_start_in_context + detected_len + snippet_window)
-                            prefix_snippet = "..." if snippet_display_start > 0 else ""
-                            suffix_snippet = "..." if snippet_display_end < len(issue['context']) else ""
-                            self.results_text.insert(tk.END, 
-                                f"  Near: {prefix_snippet}"
-                                f"{issue['context'][snippet_display_start : highlight_start_in_context]}"
-                                f">>>{actual_highlighted_segment}<<<"
-                                f"{issue['context'][highlight_start_in_context + detected_len : snippet_display_end]}"
-                                f"{suffix_snippet}\n"
-                            )
-                        else:
-                            self.results_text.insert(tk.END, f"  (Could not accurately highlight '{detected_char_display}' in context: {issue['context']})\n")
-
-                        self.results_text.insert(tk.END, "-" * 10 + "\n")
-                    self.results_text.insert(tk.END, f"Found {len(issues_list)} instance(s) of '{searched_char_for_display}' in this file ({issue_type_display}).\n")
-                else:
-                    self.results_text.insert(tk.END, f"--- No instances of '{searched_char_for_display}' found in {relative_filepath} (Mode: {search_mode_display_text}) ---\n")
-                self.results_text.insert(tk.END, "---" + "-" * (len(relative_filepath) + 20) + "---\n\n")
+class JsonLinesReporter:
+    """Writes one JSON object per checked file as soon as the file is done."""
+    def __init__(self, out):
+        self.out = out
 
-        if output_count == 0 and self.all_results_data:
-            self.results_text.insert(tk.END, f"選択されたフィルタ '{self.filter_var_options.get(current_filter, current_filter)}' に一致するファイルはありませんでした (検査文字: '{searched_char_for_display}', 範囲: {search_mode_display_text})。\n")
+    def add_file(self, filepath, result_dict):
+        record = {
+            "file": filepath,
+            "error": result_dict["error_message"],
+            "issues": [issue.to_dict() for issue in result_dict["issues_list"]],
+        }
+        if "include_sites" in result_dict:
+            record["included_from"] = result_dict["include_sites"]
+        self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.out.flush()
 
-        self.results_text.configure(state='disabled')
-        self.results_text.see(tk.END)
-        
-        summary_text = (f"サマリー (文字:'{searched_char_for_display}', 範囲:{search_mode_display_text}): {total_processed}ファイル検査完了。 "
-                        f"問題あり: {files_with_issues_summary}ファイル ({total_individual_issues_summary}件)。 "
-                        f"エラー: {files_with_errors_summary}ファイル。 "
-                        f"(現在 {output_count}ファイル表示中)")
-        self.summary_label.config(text=summary_text)
+    def finish(self):
+        pass
 
-if __name__ == "__main__":
+class SarifReporter:
+    """Streams a SARIF 2.1.0 log: results are written as files finish, the run is
+    closed (with read errors as tool notifications) by finish(). The rules of
+    ``rule_set`` are listed in the driver next to the plain target check."""
+    def __init__(self, out, rule_set=None):
+        self.out = out
+        self.first_result = True
+        self.notifications = []
+        rules = [{"id": "target-char", "shortDescription": {"text": "Target character found in the checked range"}}]
+        for rule in (rule_set.rules if rule_set is not None else ()):
+            if rule.info is not None:
+                rules.append({"id": rule.id, "shortDescription": {"text": rule.message or f"{rule.type} rule"},
+                              "defaultConfiguration": {"level": SARIF_LEVELS[rule.severity]}})
+        self.out.write(
+            '{"$schema": "%s", "version": "2.1.0", "runs": [{'
+            '"tool": {"driver": {"name": "tex_char_checker", "rules": %s}}, '
+            '"columnKind": "unicodeCodePoints", "results": [' % (SARIF_SCHEMA_URI, json.dumps(rules, ensure_ascii=False))
+        )
+
+    @staticmethod
+    def artifact_uri(filepath):
+        import pathlib
+        try:
+            relative = os.path.relpath(filepath)
+        except ValueError:
+            return pathlib.Path(filepath).resolve().as_uri()
+        if relative.startswith(os.pardir):
+            return pathlib.Path(filepath).resolve().as_uri()
+        return relative.replace(os.sep, "/")
+
+    def add_file(self, filepath, result_dict):
+        if result_dict["error_message"]:
+            self.notifications.append({
+                "level": "error",
+                "message": {"text": result_dict["error_message"]},
+                "locations": [{"physicalLocation": {"artifactLocation": {"uri": self.artifact_uri(filepath)}}}],
+            })
+            return
+        uri = self.artifact_uri(filepath)
+        related = [
+            {"id": n, "message": {"text": "included here"}, "physicalLocation": {
+                "artifactLocation": {"uri": self.artifact_uri(site["file"])},
+                "region": {"startLine": site["line"], "startColumn": site["col"]},
+            }}
+            for n, site in enumerate(result_dict.get("include_sites", ()))
+        ]
+        for issue in result_dict["issues_list"]:
+            rule = issue.rule
+            result = {
+                "ruleId": rule.id if rule is not None else "target-char",
+                "level": SARIF_LEVELS[rule.severity] if rule is not None else "warning",
+                "message": {"text": rule.message if rule is not None and rule.message else f"'{issue.detected_char}' in '{issue.type}'."},
+                "locations": [{"physicalLocation": {
+                    "artifactLocation": {"uri": uri},
+                    "region": {"startLine": issue.line, "startColumn": issue.col,
+                               "endColumn": issue.col + len(issue.detected_char)},
+                }}],
+            }
+            if related:
+                result["relatedLocations"] = related
+            self.out.write(("" if self.first_result else ",") + json.dumps(result, ensure_ascii=False))
+            self.first_result = False
+        self.out.flush()
+
+    def finish(self):
+        invocation = {"executionSuccessful": not self.notifications, "toolExecutionNotifications": self.notifications}
+        self.out.write('], "invocations": [%s]}]}\n' % json.dumps(invocation, ensure_ascii=False))
+        self.out.flush()
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        description="TeX文書内の指定文字を検査します。引数なしで起動するとGUIが開きます。",
+    )
+    parser.add_argument("paths", nargs="*", help="検査するフォルダまたは .tex ファイル")
+    parser.add_argument("-t", "--target", action="append", dest="targets", metavar="CHAR[=MODE]",
+                        help="検査文字 (複数指定可)。'=MODE' で文字ごとに検査範囲を指定 (既定: ，)")
+    parser.add_argument("-m", "--mode", choices=SEARCH_MODES, default=SEARCH_MODES[0], help="検査範囲 (既定: %(default)s)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="並列ワーカー数 (既定: CPUコア数)")
+    parser.add_argument("--ignore-text-commands", action="store_true", help="数式内の \\text{} 等を無視する")
+    parser.add_argument("--text-commands", metavar="NAMES",
+                        help="無視するコマンドをカンマ区切りで指定 (例: text,mbox,mathrm; --ignore-text-commands を含意)")
+    parser.add_argument("--rules", metavar="PATH",
+                        help="ルールファイル (JSON) のルールも同じ走査で検査する。-t を省略するとルールのみで検査する")
+    parser.add_argument("--project", action="store_true",
+                        help="\\documentclass を含むファイルから \\input/\\include/\\subfile を辿り、取り込まれた位置の文脈で検査する")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help=f"検索から除外するフォルダ/ファイル名のパターン (複数指定可、既定の {' '.join(DEFAULT_EXCLUDES)} に追加)")
+    parser.add_argument("--no-gitignore", action="store_true", help=".gitignore の指定を無視してフォルダを検索する")
+    parser.add_argument("-f", "--format", choices=CLI_OUTPUT_FORMATS, default="jsonl", help="出力形式 (既定: %(default)s)")
+    parser.add_argument("-o", "--output", help="出力先ファイル (既定: 標準出力)")
+    parser.add_argument("--no-cache", action="store_true", help="結果キャッシュを使わない")
+    parser.add_argument("--clear-cache", action="store_true", help="検査前に結果キャッシュを削除する (パス省略時は削除のみ)")
+    parser.add_argument("--cache-dir", help=f"キャッシュの保存先 (既定: {default_cache_dir()})")
+    parser.add_argument("--profile", action="store_true", help="フェーズ別の時間と遅いファイルの一覧を標準エラーに出力する")
+    parser.add_argument("--profile-json", metavar="PATH", help="ファイルごとの時間・バイト数・ヒット数を JSON で保存する")
+    parser.add_argument("--profile-stats", metavar="PATH",
+                        help="cProfile の統計を保存する (pstats で読める形式。全体を1プロセスで実行する)")
+    return parser
+
+def open_result_cache(cache_dir=None):
+    """Open the result cache, or return None (with a warning) if it is unusable."""
+    try:
+        return ResultCache(os.path.join(cache_dir, "results.sqlite3") if cache_dir else None)
+    except (OSError, sqlite3.Error) as e:
+        print(f"warning: result cache disabled: {e}", file=sys.stderr)
+        return None
+
+def run_cli(argv):
+    """Check files without the GUI. Returns 1 if any issue or read error was found, else 0."""
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    rule_set = None
+    if args.rules:
+        try:
+            rule_set = RuleSet.load(args.rules)
+        except (OSError, ValueError) as e:
+            parser.error(f"ルールファイルを読み込めません: {e}")
+    cache = None if args.no_cache and not args.clear_cache else open_result_cache(args.cache_dir)
+    if cache is not None and args.clear_cache:
+        cache.clear()
+    if not args.paths:
+        if cache is not None:
+            cache.close()
+        if args.clear_cache:
+            return 0
+        parser.error("検査するフォルダまたはファイルを指定してください")
+    if args.no_cache and cache is not None:
+        cache.close()
+        cache = None
+
+    if args.targets and not all(args.targets):
+        parser.error("-t に空の検査文字は指定できません")
+    targets = normalize_targets([parse_cli_target(text) for text in (args.targets or ["，"])], args.mode)
+    if rule_set is not None:
+        try:
+            targets = RuleSet.from_targets(targets, args.mode) + rule_set if args.targets else rule_set
+        except ValueError as e:
+            # A rule id equal to a target character.
+            parser.error(f"-t の検査文字とルールを組み合わせられません: {e}")
+    excludes = DEFAULT_EXCLUDES + tuple(pattern for entry in args.exclude for pattern in parse_exclude_entry(entry))
+    files = collect_cli_files(args.paths, excludes, not args.no_gitignore)
+
+    if args.output:
+        out = open(args.output, "w", encoding="utf-8")
+    else:
+        out = sys.stdout
+        if hasattr(out, "reconfigure"):
+            out.reconfigure(encoding="utf-8")
+
+    ignore_text_flag = args.text_commands or args.ignore_text_commands
+    scan_profile = None
+    if args.profile or args.profile_json:
+        if args.project:
+            print("warning: per-file profiling is not available in project mode", file=sys.stderr)
+        else:
+            scan_profile = ScanProfile()
+    profiler = None
+    max_workers = args.jobs
+    if args.profile_stats:
+        # cProfile only sees this process, so the files are checked here too.
+        import cProfile
+        profiler = cProfile.Profile()
+        max_workers = 1
+    found_problems = False
+    try:
+        reporter = SarifReporter(out, rule_set) if args.format == "sarif" else JsonLinesReporter(out)
+        if profiler is not None:
+            profiler.enable()
+        if args.project:
+            # Results depend on the include context, so the per-file cache is not used.
+            results = TexProject(targets, ignore_text_flag, args.mode).check(list(files))[0].items()
+        else:
+            results = ((filepath, result_dict) for _, filepath, result_dict in iter_check_results(
+                files, targets, ignore_text_flag, args.mode, max_workers=max_workers, cache=cache, profile=scan_profile is not None))
+        for filepath, result_dict in results:
+            if scan_profile is not None:
+                scan_profile.add_result(filepath, result_dict)
+                output_start = time.perf_counter()
+            reporter.add_file(filepath, result_dict)
+            if scan_profile is not None:
+                scan_profile.add_stage("output", time.perf_counter() - output_start)
+            if result_dict["error_message"] or result_dict["issues_list"]:
+                found_problems = True
+        reporter.finish()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if cache is not None:
+            cache.close()
+        if out is not sys.stdout:
+            out.close()
+    if profiler is not None:
+        profiler.dump_stats(args.profile_stats)
+    if scan_profile is not None:
+        scan_profile.finish()
+        if args.profile:
+            for line in scan_profile.format_table():
+                print(line, file=sys.stderr)
+        if args.profile_json:
+            scan_profile.write_json(args.profile_json)
+    return 1 if found_problems else 0
+
+def run_gui():
+    load_tk()
     root = tk.Tk()
     app = TexCharCheckerApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return run_cli(argv)
+    run_gui()
+    return 0
+
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())